@@ -0,0 +1,75 @@
+import asyncio
+from typing import Protocol
+
+from .compiler import Instruction
+from .interpreter import _NEED_INPUT, _PAUSE, RightInfiniteTape, StateMachine
+from .tape import ArrayTape
+
+# Default number of instructions a machine runs before it lets others run.
+SLICE = 10_000
+
+
+class Source(Protocol):
+    async def get(self) -> int | None: ...
+
+
+class Sink(Protocol):
+    async def put(self, value: int) -> None: ...
+
+
+class AsyncMachine:
+    """
+    Runs a program as a coroutine, so many programs can share one thread.
+
+    ``,`` awaits ``source.get()`` and ``.`` awaits ``sink.put(value)``, an
+    ``asyncio.Queue`` works for both. A ``None`` from the source marks the
+    end of the input, reading past it raises ``IndexError`` like the
+    blocking interpreter does. Every ``slice_steps`` instructions the
+    machine yields to the event loop.
+
+    Budgets work like in ``StateMachine``, the timeout includes the time
+    spent waiting for input.
+    """
+
+    def __init__(
+        self,
+        program: str | None,
+        source: Source,
+        sink: Sink,
+        tape: RightInfiniteTape | ArrayTape | None = None,
+        slice_steps: int = SLICE,
+        max_steps: int | None = None,
+        timeout: float | None = None,
+        code: list[Instruction] | None = None,
+    ) -> None:
+        self._machine = StateMachine(
+            program, (), tape=tape, max_steps=max_steps, timeout=timeout, code=code
+        )
+        self._machine._read = lambda: None
+        self._machine._slice = slice_steps
+        self._source = source
+        self._sink = sink
+
+    @property
+    def steps(self) -> int:
+        return self._machine.steps
+
+    async def run(self) -> None:
+        machine = self._machine
+        execution = machine._execute(machine._code)
+        value = None
+        while True:
+            try:
+                event = execution.send(value)
+            except StopIteration:
+                break
+            value = None
+            if event is _NEED_INPUT:
+                value = await self._source.get()
+                if value is None:
+                    execution.throw(IndexError("No input left"))
+            elif event is _PAUSE:
+                await asyncio.sleep(0)
+            else:
+                await self._sink.put(event)
+        machine._program_counter = machine._program_length()
@@ -0,0 +1,140 @@
+from typing import Sequence
+
+import numpy as np
+
+from .compiler import (
+    ADD,
+    CLEAR,
+    IN,
+    JZ,
+    MOVE,
+    MULADD,
+    OUT,
+    SCAN,
+    compile_program,
+)
+from .tape import CellMode
+
+
+def run_batch(
+    program: str,
+    input_batches: Sequence[Sequence[int]],
+    cells: CellMode = CellMode.UNBOUNDED,
+) -> list[list[int]]:
+    return BatchMachine(program, input_batches, cells).run()
+
+
+class BatchMachine:
+    """
+    Runs one program over many input vectors in lockstep.
+
+    All tapes live in one 2D array with a pointer per instance. Every
+    instruction is applied to the set of active instances at once. A loop
+    keeps iterating with the subset of instances whose control cell is
+    nonzero, such that instances that diverge only cost extra passes
+    through the loops where they actually differ.
+
+    Cells are stored as 64 bit integers. A tape assertion in any instance
+    fails the whole batch.
+    """
+
+    def __init__(
+        self,
+        program: str,
+        input_batches: Sequence[Sequence[int]],
+        cells: CellMode = CellMode.UNBOUNDED,
+    ) -> None:
+        self._code = compile_program(program)
+        self._modulus = cells.modulus
+        count = len(input_batches)
+        self._tapes = np.zeros((count, 64), dtype=np.int64)
+        self._pointers = np.zeros(count, dtype=np.intp)
+
+        width = max((len(inputs) for inputs in input_batches), default=0)
+        self._inputs = np.zeros((count, max(width, 1)), dtype=np.int64)
+        for row, inputs in enumerate(input_batches):
+            self._inputs[row, : len(inputs)] = inputs
+        if self._modulus is not None:
+            self._inputs %= self._modulus
+        self._input_lengths = np.array([len(x) for x in input_batches], dtype=np.intp)
+        self._input_positions = np.zeros(count, dtype=np.intp)
+        self._outputs = [[] for _ in range(count)]
+
+    def run(self) -> list[list[int]]:
+        self._block(0, len(self._code), np.arange(len(self._outputs)))
+        return self._outputs
+
+    def _block(self, start: int, end: int, rows: np.ndarray) -> None:
+        index = start
+        while index < end and rows.size:
+            op, arg = self._code[index]
+            if op == JZ:
+                active = rows[self._cells(rows) != 0]
+                while active.size:
+                    self._block(index + 1, arg - 1, active)
+                    active = active[self._cells(active) != 0]
+                index = arg
+                continue
+
+            pointers = self._pointers[rows]
+            if op == MOVE:
+                self._check_bounds(rows, arg)
+                self._pointers[rows] = pointers + arg
+            elif op == ADD:
+                self._store(rows, pointers, self._tapes[rows, pointers] + arg)
+            elif op == CLEAR:
+                self._tapes[rows, pointers] = 0
+            elif op == MULADD:
+                values = self._tapes[rows, pointers]
+                moving = values != 0
+                active, pointers, values = (
+                    rows[moving],
+                    pointers[moving],
+                    values[moving],
+                )
+                for offset, factor in arg:
+                    self._check_bounds(active, offset)
+                    targets = pointers + offset
+                    totals = self._tapes[active, targets] + factor * values
+                    self._store(active, targets, totals)
+                self._tapes[active, pointers] = 0
+            elif op == SCAN:
+                active = rows[self._cells(rows) != 0]
+                while active.size:
+                    self._check_bounds(active, arg)
+                    self._pointers[active] += arg
+                    active = active[self._cells(active) != 0]
+            elif op == IN:
+                positions = self._input_positions[rows]
+                missing = positions >= self._input_lengths[rows]
+                if missing.any():
+                    raise IndexError(f"No input left for instances {rows[missing]}")
+                self._tapes[rows, pointers] = self._inputs[rows, positions]
+                self._input_positions[rows] = positions + 1
+            elif op == OUT:
+                values = self._tapes[rows, pointers].tolist()
+                for row, value in zip(rows.tolist(), values):
+                    self._outputs[row].append(value)
+            index += 1
+
+    def _cells(self, rows: np.ndarray) -> np.ndarray:
+        return self._tapes[rows, self._pointers[rows]]
+
+    def _store(self, rows: np.ndarray, columns: np.ndarray, values: np.ndarray) -> None:
+        if self._modulus is not None:
+            values %= self._modulus
+        else:
+            negative = values < 0
+            assert not negative.any(), f"Decrement of zero in {rows[negative]}"
+        self._tapes[rows, columns] = values
+
+    def _check_bounds(self, rows: np.ndarray, offset: int) -> None:
+        if offset < 0:
+            below = self._pointers[rows] + offset < 0
+            assert not below.any(), f"Moved left of the tape in {rows[below]}"
+        elif offset > 0 and rows.size:
+            needed = int(self._pointers[rows].max()) + offset + 1
+            width = self._tapes.shape[1]
+            if needed > width:
+                extra = max(needed, 2 * width) - width
+                self._tapes = np.pad(self._tapes, ((0, 0), (0, extra)))
@@ -0,0 +1,2 @@
+from .runner import ENGINES, Measurement, find_regressions, load, run_benchmarks, save
+from .workloads import Workload, all_workloads
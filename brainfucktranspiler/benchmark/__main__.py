@@ -0,0 +1,49 @@
+import argparse
+import pathlib
+import sys
+
+from .runner import ENGINES, find_regressions, load, run_benchmarks, save
+from .workloads import all_workloads
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m brainfucktranspiler.benchmark",
+        description="Benchmark the execution engines and the code generator.",
+    )
+    parser.add_argument("--engines", nargs="+", choices=sorted(ENGINES))
+    parser.add_argument("--filter", default="", help="Substring of workload names")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=pathlib.Path)
+    parser.add_argument("--baseline", type=pathlib.Path)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Allowed relative slowdown against the baseline",
+    )
+    options = parser.parse_args()
+
+    workloads = [w for w in all_workloads() if options.filter in w.name]
+    measurements = run_benchmarks(workloads, options.engines, options.repeat)
+    for m in measurements:
+        print(
+            f"{m.workload:24} {m.engine:9} {m.wall_seconds * 1e3:10.3f} ms "
+            f"{m.instructions_per_second / 1e6:8.2f} Minstr/s "
+            f"{m.peak_memory_bytes / 1024:8.1f} KiB {m.code_size:7} chars "
+            f"{m.codegen_seconds * 1e3:8.3f} ms codegen"
+        )
+    if options.output:
+        save(measurements, options.output)
+    if options.baseline:
+        regressions = find_regressions(
+            load(options.baseline), measurements, options.threshold
+        )
+        for regression in regressions:
+            print("Regression:", regression, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
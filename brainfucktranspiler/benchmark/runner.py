@@ -0,0 +1,144 @@
+import dataclasses
+import json
+import pathlib
+import time
+import tracemalloc
+from typing import Callable, Iterable
+
+from ..interpreter import StateMachine
+from ..jit import jit_compile
+from ..native import find_compiler, native_compile
+from .workloads import Workload
+
+Engine = Callable[[str, list[int]], list[int]]
+
+
+def _run_step(code: str, inputs: list[int]) -> list[int]:
+    machine = StateMachine(code, inputs)
+    while machine._program_counter != len(code):
+        machine.step()
+    return machine._outputs
+
+
+def _run_bytecode(code: str, inputs: list[int]) -> list[int]:
+    return StateMachine(code, inputs).run()
+
+
+def _run_jit(code: str, inputs: list[int]) -> list[int]:
+    return jit_compile(code)(inputs)
+
+
+ENGINES: dict[str, Engine] = {
+    "step": _run_step,
+    "bytecode": _run_bytecode,
+    "jit": _run_jit,
+}
+
+try:
+    from ..batch import run_batch
+except ImportError:
+    pass
+else:
+    ENGINES["batch"] = lambda code, inputs: run_batch(code, [inputs])[0]
+
+if find_compiler() is not None:
+    ENGINES["native"] = lambda code, inputs: native_compile(code)(inputs)
+
+
+@dataclasses.dataclass
+class Measurement:
+    workload: str
+    engine: str
+    wall_seconds: float
+    instructions: int
+    instructions_per_second: float
+    peak_memory_bytes: int
+    code_size: int
+    codegen_seconds: float
+
+
+def run_benchmarks(
+    workloads: Iterable[Workload],
+    engines: Iterable[str] | None = None,
+    repeat: int = 3,
+) -> list[Measurement]:
+    """
+    Runs every workload on every engine.
+
+    Each engine gets one untimed run first, such that compilation caches are
+    warm. The wall time is the best of ``repeat`` runs. Peak memory is taken in
+    a separate traced run, as tracing slows execution down. Instructions
+    are counted by the bytecode interpreter, such that the rate is
+    comparable between engines.
+    """
+    selected = list(ENGINES) if engines is None else list(engines)
+    measurements = []
+    for workload in workloads:
+        reference = StateMachine(workload.code, list(workload.inputs))
+        expected = reference.run()
+        for engine in selected:
+            run = ENGINES[engine]
+            run(workload.code, list(workload.inputs))
+            wall = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                outputs = run(workload.code, list(workload.inputs))
+                wall = min(wall, time.perf_counter() - start)
+            assert outputs == expected, f"{engine} disagrees on {workload.name}"
+
+            tracemalloc.start()
+            run(workload.code, list(workload.inputs))
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            measurements.append(
+                Measurement(
+                    workload=workload.name,
+                    engine=engine,
+                    wall_seconds=wall,
+                    instructions=reference.steps,
+                    instructions_per_second=reference.steps / max(wall, 1e-9),
+                    peak_memory_bytes=peak,
+                    code_size=len(workload.code),
+                    codegen_seconds=workload.codegen_seconds,
+                )
+            )
+    return measurements
+
+
+def save(measurements: list[Measurement], path: pathlib.Path) -> None:
+    with open(path, "w") as f:
+        json.dump([dataclasses.asdict(m) for m in measurements], f, indent=2)
+
+
+def load(path: pathlib.Path) -> list[Measurement]:
+    with open(path) as f:
+        return [Measurement(**record) for record in json.load(f)]
+
+
+def find_regressions(
+    baseline: list[Measurement],
+    current: list[Measurement],
+    threshold: float,
+    minimum_seconds: float = 1e-3,
+) -> list[str]:
+    """
+    Lists every workload and engine whose wall time grew by more than the
+    relative ``threshold`` over the baseline. Runs faster than
+    ``minimum_seconds`` in both are too noisy to compare and skipped.
+    """
+    previous = {(m.workload, m.engine): m for m in baseline}
+    regressions = []
+    for measurement in current:
+        old = previous.get((measurement.workload, measurement.engine))
+        if old is None:
+            continue
+        if max(old.wall_seconds, measurement.wall_seconds) < minimum_seconds:
+            continue
+        ratio = measurement.wall_seconds / max(old.wall_seconds, 1e-9)
+        if ratio > 1 + threshold:
+            regressions.append(
+                f"{measurement.workload} on {measurement.engine}: "
+                f"{old.wall_seconds:.4f} s -> {measurement.wall_seconds:.4f} s"
+            )
+    return regressions
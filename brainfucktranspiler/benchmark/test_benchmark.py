@@ -0,0 +1,30 @@
+import dataclasses
+import pathlib
+
+from .runner import find_regressions, load, run_benchmarks, save
+from .workloads import all_workloads, helper_workloads
+
+
+def test_workloads_cover_helpers() -> None:
+    names = {workload.name for workload in all_workloads(sizes=(2,))}
+    assert "fn_divide/2" in names
+    assert "euler_1/10" in names
+    assert "classic/hello_world" in names
+
+
+def test_run_and_compare(tmp_path: pathlib.Path) -> None:
+    workloads = helper_workloads(3)[:2]
+    measurements = run_benchmarks(workloads, ["bytecode", "jit"], repeat=1)
+    assert len(measurements) == 4
+    assert all(m.instructions > 0 and m.code_size > 0 for m in measurements)
+
+    path = tmp_path / "baseline.json"
+    save(measurements, path)
+    baseline = load(path)
+    assert baseline == measurements
+    assert find_regressions(baseline, measurements, 0.2) == []
+
+    slower = [
+        dataclasses.replace(m, wall_seconds=m.wall_seconds * 2 + 1) for m in baseline
+    ]
+    assert len(find_regressions(baseline, slower, 0.2)) == 4
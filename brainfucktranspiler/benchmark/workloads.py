@@ -0,0 +1,140 @@
+import dataclasses
+import time
+from typing import Callable
+
+from .. import codegen
+from ..codegen import TapeStack, Variable, op_input, op_output
+
+
+@dataclasses.dataclass
+class Workload:
+    name: str
+    code: str
+    inputs: list[int]
+    codegen_seconds: float = 0.0
+
+
+HELLO_WORLD = (
+    "++++++++[>++++[>++>+++>+++>+<<<<-]>+>+>->>+[<]<-]>>.>---.+++++++..+++.>>.<-."
+    "<.+++.------.--------.>>+.>++."
+)
+REVERSE = ">,[>,]<[.<]"
+SQUARES = (
+    "++++[>+++++<-]>[<+++++>-]+<+[>[>+>+<<-]++>>[<<+>>-]>>>[-]++>[-]+>>>+[[-]++++++>>"
+    ">]<<<[[<++++++++<++>>-]+<.<[>----<-]<]<<[>>>>>[>>>[-]+++++++++<[>-<-]+++++++++>"
+    "[-[<->-]+[<<<]]<[>+<-]>]<<-]<<-]"
+)
+
+# Operand values each helper is benchmarked with.
+SIZES = (5, 20, 50)
+
+_BINARY = [
+    "fn_plus",
+    "fn_minus",
+    "fn_multiply",
+    "fn_multiply_fast",
+    "fn_and",
+    "fn_or",
+    "fn_less",
+    "fn_less_equals",
+    "fn_greater",
+    "fn_greater_equals",
+]
+_UNARY = ["fn_copy", "fn_not"]
+_DIVISION = ["fn_divide", "fn_divide_fast"]
+
+
+def all_workloads(sizes: tuple[int, ...] = SIZES) -> list[Workload]:
+    workloads = []
+    for size in sizes:
+        workloads.extend(helper_workloads(size))
+    for ceiling in (10, 30, 60):
+        workloads.append(euler_1_workload(ceiling))
+    workloads.append(Workload("classic/hello_world", HELLO_WORLD, []))
+    workloads.append(Workload("classic/reverse", REVERSE, list(range(1, 200)) + [0]))
+    workloads.append(Workload("classic/squares", SQUARES, []))
+    return workloads
+
+
+def helper_workloads(size: int) -> list[Workload]:
+    workloads = []
+    for name in _UNARY:
+        workloads.append(_generate(f"{name}/{size}", [size], 2, name, 1))
+    for name in _BINARY:
+        inputs = [size, max(size // 2, 1)]
+        workloads.append(_generate(f"{name}/{size}", inputs, 3, name, 1))
+    for name in _DIVISION:
+        inputs = [size, 3]
+        workloads.append(_generate(f"{name}/{size}", inputs, 4, name, 2))
+    return workloads
+
+
+def euler_1_workload(ceiling: int) -> Workload:
+    start = time.perf_counter()
+    code = euler_1(TapeStack())
+    return Workload(
+        f"euler_1/{ceiling}", code, [3, 5, ceiling], time.perf_counter() - start
+    )
+
+
+def euler_1(tape: TapeStack) -> str:
+    """
+    Generates the solution of Project Euler problem 1 on the tape. It reads
+    two divisors and a ceiling and outputs the sum of all numbers below
+    the ceiling divisible by either.
+    """
+    result = tape.register_variable()
+    divisor_1 = tape.register_variable()
+    divisor_2 = tape.register_variable()
+    ceiling = tape.register_variable()
+    quotient = tape.register_variable()
+    remainder = tape.register_variable()
+    is_divisible_by_3 = tape.register_variable()
+    is_divisible_by_5 = tape.register_variable()
+    is_divisible_by_either = tape.register_variable()
+
+    def loop_body() -> str:
+        return (
+            codegen.fn_divide(tape, quotient, remainder, ceiling, divisor_1)
+            + codegen.fn_not(tape, is_divisible_by_3, remainder)
+            + codegen.fn_divide(tape, quotient, remainder, ceiling, divisor_2)
+            + codegen.fn_not(tape, is_divisible_by_5, remainder)
+            + codegen.fn_or(
+                tape, is_divisible_by_either, is_divisible_by_3, is_divisible_by_5
+            )
+            + codegen.op_if(
+                tape,
+                is_divisible_by_either,
+                lambda: codegen.fn_plus(tape, result, result, ceiling),
+            )
+            + codegen.op_decrement(tape, ceiling)
+        )
+
+    return tape.build(
+        lambda: op_input(tape, divisor_1)
+        + op_input(tape, divisor_2)
+        + op_input(tape, ceiling)
+        + codegen.op_decrement(tape, ceiling)
+        + codegen.op_while(tape, ceiling, loop_body)
+        + op_output(tape, result)
+    )
+
+
+def _generate(
+    name: str, inputs: list[int], variables: int, helper: str, outputs: int
+) -> Workload:
+    """
+    Builds a program that reads the operands, calls the helper with all
+    variables and writes the first ``outputs`` variables.
+    """
+    start = time.perf_counter()
+    tape = TapeStack()
+    cells: list[Variable] = [tape.register_variable() for _ in range(variables)]
+    operands = cells[outputs:]
+    function: Callable[..., str] = getattr(codegen, helper)
+    code = tape.build(
+        lambda: "".join(op_input(tape, operand) for operand in operands)
+        + function(tape, *cells)
+        + "".join(op_output(tape, cell) for cell in cells[:outputs])
+    )
+    return Workload(name, code, inputs, time.perf_counter() - start)
@@ -1,16 +1,117 @@
 import abc
+import collections
+import functools
+import math
 from typing import Callable
 
+from . import peephole
+from .compiler import Compiler, Instruction
+from .sourcemap import SourceMap, SourceMapEntry
+from .tape import CellMode
+
 
 class Variable:
     def __init__(self, position: int) -> None:
         self.position = position
 
 
+class FragmentCache:
+    """
+    Bounded LRU cache of generated fragments.
+
+    A helper that only takes variables emits the same code whenever its
+    operands sit at the same offsets from the cursor, the cursor is at the
+    same cell and the same number of variables is registered. The entry
+    stores the code together with the cursor position after it.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: collections.OrderedDict[tuple, tuple[str, int]] = (
+            collections.OrderedDict()
+        )
+
+    def generate(
+        self,
+        tape: "TapeStack",
+        helper: Callable,
+        operands: tuple["Variable", ...],
+        body: Callable[[], str | None],
+    ) -> None:
+        key = (
+            helper,
+            tuple(operand.position - tape._position for operand in operands),
+            tape._position,
+            len(tape._stack),
+        )
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            code, tape._position = entry
+            tape.emit(code)
+            return
+
+        self.misses += 1
+        start = len(tape._code)
+        tape._captures += 1
+        try:
+            tape._generate(body)
+        finally:
+            tape._captures -= 1
+        code = "".join(tape._code[start:])
+        del tape._code[start:]
+        tape._length -= len(code)
+        tape.emit(code)
+        self._entries[key] = (code, tape._position)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+# Iterations of a loop on a known condition that are evaluated at generation
+# time before a real loop is emitted instead.
+UNROLL_LIMIT = 1024
+
+
 class TapeStack:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        optimize: bool = False,
+        cache_size: int = 1024,
+        source_map: bool = False,
+        sink: Callable[[str], None] | None = None,
+        constants: bool = False,
+        cells: CellMode = CellMode.UNBOUNDED,
+    ) -> None:
+        if optimize and source_map:
+            raise ValueError("Optimized code cannot be source mapped")
+        if optimize and sink is not None:
+            raise ValueError("Optimized code cannot be streamed")
+        if constants and source_map:
+            raise ValueError("Partially evaluated code cannot be source mapped")
         self._stack = []
         self._position = 0
+        self._code: list[str] = []
+        self._depth = 0
+        self._optimize = optimize
+        self._loop_depth = 0
+        self._length = 0
+        self._path: list[str] = []
+        self._sink = sink
+        self._captures = 0
+        self._entries: list[SourceMapEntry] | None = [] if source_map else None
+        self._constants = constants
+        self._cells = cells
+        self._values: dict[int, int | None] = {}
+        self._default: int | None = 0
+        self._pending: dict[int, int] = {}
+        self._writes: list[set[int]] = []
+        if cache_size and not source_map and not constants:
+            self.fragments = FragmentCache(cache_size)
+        else:
+            self.fragments = None
 
     def register_variable(self) -> Variable:
         new_position = len(self._stack)
@@ -23,44 +124,454 @@ class TapeStack:
         self._stack.pop()
 
     def seek(self, variable: Variable) -> str:
-        result = []
-        while variable.position > self._position:
-            result.append(">")
-            self._position += 1
-        while variable.position < self._position:
-            result.append("<")
-            self._position -= 1
-        return "".join(result)
+        distance = variable.position - self._position
+        self._position = variable.position
+        return ">" * distance if distance > 0 else "<" * -distance
+
+    def emit(self, code: str) -> None:
+        if code:
+            if self._sink is None or self._captures:
+                self._code.append(code)
+            else:
+                self._sink(code)
+            self._length += len(code)
+
+    def _generate(self, body: Callable[[], str | None]) -> None:
+        """
+        Runs ``body`` and emits the code it returns.
+
+        Helpers called in ``body`` emit their code right away and return an
+        empty string, so code returned next to them would end up behind
+        them regardless of where it was concatenated. Such a body raises a
+        ``ValueError``, pass raw code to ``emit`` between the helper calls
+        instead.
+        """
+        length = self._length
+        code = body()
+        if code and self._length != length:
+            raise ValueError(
+                "Code returned together with helper calls cannot be placed, "
+                "pass it to TapeStack.emit instead"
+            )
+        self.emit(code)
+
+    def _value(self, variable: Variable) -> int | None:
+        """
+        Returns the value the cell is known to have at this point of the
+        program, or ``None``.
+        """
+        return self._values.get(variable.position, self._default)
+
+    def _fold(self, variable: Variable, amount: int) -> bool:
+        """
+        Records a change of a known cell without emitting code for it and
+        returns whether that was possible. The change is written to the
+        tape by ``_flush`` once some code depends on it.
+        """
+        if not self._constants:
+            return False
+        value = self._value(variable)
+        if value is None:
+            return False
+        new_value = value + amount
+        if self._cells.modulus:
+            new_value %= self._cells.modulus
+        elif new_value < 0:
+            return False
+        position = variable.position
+        self._note_write(position)
+        actual = self._pending.setdefault(position, value)
+        self._values[position] = new_value
+        if actual == new_value:
+            del self._pending[position]
+        return True
+
+    def _touch(self, variable: Variable, overwrite: bool = False) -> str:
+        """
+        Prepares emitting code that changes the cell in an unknown way.
+        Returns the code to write its pending value first, unless it is
+        overwritten anyway.
+        """
+        if not self._constants:
+            return ""
+        position = variable.position
+        self._note_write(position)
+        code = "" if overwrite else self._materialize(variable)
+        self._pending.pop(position, None)
+        self._values[position] = None
+        return code
+
+    def _materialize(self, variable: Variable) -> str:
+        actual = self._pending.pop(variable.position, None)
+        if actual is None:
+            return ""
+        return self._set_code(variable, self._value(variable), actual)
+
+    def _set_code(self, variable: Variable, value: int, actual: int | None) -> str:
+        """
+        Returns the shortest code found that changes the cell from
+        ``actual``, or an unknown value if that is ``None``, to ``value``.
+        It either adds the difference or clears the cell and adds
+        ``value``, see ``_add_code``.
+        """
+        start = self._position
+        best = None
+        if actual is not None:
+            best = self._add_code(variable, value - actual)
+            self._position = start
+        cleared = self.seek(variable) + "[-]"
+        code, scratch = self._add_code(variable, value)
+        code = cleared + code
+        if best is None or len(code) < len(best[0]):
+            best = code, scratch
+        self._position = variable.position
+        code, scratch = best
+        self._release(scratch)
+        return code
+
+    def _add_code(self, variable: Variable, amount: int) -> tuple[str, Variable | None]:
+        """
+        Returns code that adds ``amount`` to the cell and leaves the cursor
+        on it, together with the scratch cell it uses. That is either a run
+        of ``+`` or ``-`` or a loop that adds a factor to the cell as often
+        as a counter in a scratch cell says, whichever is shorter. The
+        caller passes the scratch cell to ``_release`` if it keeps the code.
+        """
+        modulus = self._cells.modulus
+        start = self._position
+        linear = self.seek(variable) + _add(amount, modulus)
+        factors = _factor(amount, modulus)
+        if factors is None or variable.position >= len(self._stack):
+            return linear, None
+        counter, step, rest = factors
+        self._position = start
+        scratch = self.register_variable()
+        loop = (
+            self.seek(scratch)
+            + self._prepare(scratch, counter)
+            + "[-"
+            + self.seek(variable)
+            + _add(step, modulus)
+            + self.seek(scratch)
+            + "]"
+            + self.seek(variable)
+            + _add(rest, modulus)
+        )
+        self.unregister_variable(scratch)
+        if len(loop) < len(linear):
+            return loop, scratch
+        return linear, None
+
+    def _prepare(self, scratch: Variable, counter: int) -> str:
+        actual = None
+        if self._constants:
+            actual = self._pending.get(scratch.position, self._value(scratch))
+        if actual is None:
+            return "[-]" + _add(counter, None)
+        return _add(counter - actual, self._cells.modulus)
+
+    def _release(self, scratch: Variable | None) -> None:
+        if scratch is not None and self._constants:
+            self._note_write(scratch.position)
+            self._pending.pop(scratch.position, None)
+            self._values[scratch.position] = 0
+
+    def _set_constant(self, variable: Variable, value: int) -> str:
+        if self._cells.modulus:
+            value %= self._cells.modulus
+        elif value < 0:
+            raise ValueError(f"Cells cannot hold negative values, got {value}")
+        known = self._value(variable) if self._constants else None
+        if known is not None and self._fold(variable, value - known):
+            return ""
+        code = self._touch(variable, overwrite=True) + self._set_code(
+            variable, value, None
+        )
+        if self._constants:
+            self._values[variable.position] = value
+        return code
+
+    def _add_constant(self, variable: Variable, amount: int) -> str:
+        if self._fold(variable, amount):
+            return ""
+        code = self._touch(variable)
+        added, scratch = self._add_code(variable, amount)
+        self._release(scratch)
+        return code + added
+
+    def _flush(self) -> str:
+        return "".join(
+            self._materialize(Variable(position)) for position in sorted(self._pending)
+        )
+
+    def _note_write(self, position: int) -> None:
+        for written in self._writes:
+            written.add(position)
+
+    def _enter_loop(self) -> tuple[dict[int, int | None], int | None]:
+        """
+        Forgets all values before generating code that may run any number
+        of times. Pending changes have to be flushed before.
+        """
+        assert not self._pending
+        saved = self._values, self._default
+        self._values, self._default = {}, None
+        self._writes.append(set())
+        return saved
+
+    def _leave_loop(self, saved: tuple[dict[int, int | None], int | None]) -> None:
+        """
+        Restores the values from before the loop except for the cells it
+        may have written. Pending changes have to be flushed before.
+        """
+        assert not self._pending
+        self._values, self._default = saved
+        for position in self._writes.pop():
+            self._values[position] = None
+
+    def _evaluate(self, condition: Variable, body: Callable[[], str]) -> bool:
+        """
+        Tries to run a loop on a known condition at generation time. This
+        succeeds if every iteration only changes known cells and the
+        condition reaches zero within ``UNROLL_LIMIT`` iterations,
+        otherwise everything is rolled back.
+        """
+        saved = (
+            self._position,
+            dict(self._values),
+            self._default,
+            dict(self._pending),
+            len(self._code),
+            self._length,
+        )
+        self._captures += 1
+        try:
+            for _ in range(UNROLL_LIMIT):
+                self._generate(body)
+                if len(self._code) > saved[4]:
+                    break
+                value = self._value(condition)
+                if value == 0:
+                    return True
+                if value is None:
+                    break
+        finally:
+            self._captures -= 1
+        self._position, self._values, self._default, self._pending = saved[:4]
+        del self._code[saved[4] :]
+        self._length = saved[5]
+        return False
+
+    def source_map(self) -> SourceMap:
+        assert self._entries is not None, "Create the tape with source_map=True"
+        return SourceMap(self._entries)
+
+    def _mapped(
+        self, helper: str, args: tuple, body: Callable[[], str | None]
+    ) -> Callable[[], None]:
+        def record() -> None:
+            start = self._length
+            self._path.append(helper)
+            path = tuple(self._path)
+            try:
+                self._generate(body)
+            finally:
+                self._path.pop()
+            operands = tuple(arg.position for arg in args if isinstance(arg, Variable))
+            self._entries.append(
+                SourceMapEntry(start, self._length, helper, operands, path)
+            )
+
+        return record
+
+    def build(self, body: Callable[[], str | None]) -> str:
+        """
+        Runs the code generation in ``body`` and returns the result as one
+        string.
+
+        Helpers called while building append to a buffer owned by the tape
+        and return an empty string. Only the outermost call joins the
+        buffer, so generating a program is linear in its size. ``body`` may
+        return code only if it calls no helpers, see ``generate``.
+
+        If the tape was created with ``optimize``, the result is passed
+        through the peephole optimizer. As the state of the tape before the
+        fragment is unknown, only what the fragment itself establishes is
+        used.
+
+        With ``source_map``, every helper call records the range it emitted
+        and the fragment cache is not used.
+
+        With a ``sink``, code is passed to it in chunks as soon as it is
+        generated and the outermost call returns an empty string. Only
+        fragments that are being cached are held back until they are
+        complete.
+        """
+        start = len(self._code)
+        self._depth += 1
+        try:
+            self._generate(body)
+        finally:
+            self._depth -= 1
+        if self._depth:
+            return ""
+        code = "".join(self._code[start:])
+        del self._code[start:]
+        if self._optimize:
+            code = peephole.optimize(code, zero_tape=False)
+        return code
+
+
+def _add(amount: int, modulus: int | None) -> str:
+    if modulus and amount % modulus > modulus // 2:
+        return "-" * (-amount % modulus)
+    if modulus:
+        return "+" * (amount % modulus)
+    return "+" * amount if amount > 0 else "-" * -amount
+
+
+def _factor(amount: int, modulus: int | None) -> tuple[int, int, int] | None:
+    """
+    Splits ``amount`` into ``counter * step + rest`` with the smallest sum
+    of magnitudes and a counter of at least two. Without a modulus, the
+    cell must never go below zero on the way, so ``step`` has the sign of
+    ``amount`` and a negative amount is not overshot.
+    """
+    if modulus:
+        amount %= modulus
+        targets = (amount, amount - modulus)
+    else:
+        targets = (amount,)
+    best = None
+    for target in targets:
+        for counter in range(2, math.isqrt(abs(target)) + 2):
+            for step in {target // counter, -(-target // counter)}:
+                rest = target - counter * step
+                if not modulus and (step * target <= 0 or target < 0 < rest):
+                    continue
+                cost = counter + abs(step) + abs(rest)
+                if step and (best is None or cost < best[0]):
+                    best = cost, counter, step, rest
+    return best[1:] if best else None
+
+
+def compile_generated(
+    generate: Callable[[TapeStack], object],
+    idioms: bool = True,
+    cache_size: int = 1024,
+) -> list[Instruction]:
+    """
+    Runs ``generate`` on a fresh tape and compiles the code while it is
+    being generated, without building the source as one string. Pass the
+    result as ``code`` to ``StateMachine``, ``compiler.to_source`` renders
+    it if the source is needed after all.
+    """
+    compiler = Compiler(idioms)
+    generate(TapeStack(cache_size=cache_size, sink=compiler.feed))
+    return compiler.finish()[0]
+
+
+def fragment(helper: Callable[..., str | None]) -> Callable[..., str]:
+    @functools.wraps(helper)
+    def wrapper(tape: TapeStack, *args) -> str:
+        def body() -> str | None:
+            return helper(tape, *args)
+
+        if tape._entries is not None:
+            return tape.build(tape._mapped(helper.__name__, args, body))
+        return tape.build(body)
+
+    return wrapper
+
+
+def cached_fragment(helper: Callable[..., str | None]) -> Callable[..., str]:
+    @functools.wraps(helper)
+    def wrapper(tape: TapeStack, *operands: Variable) -> str:
+        def body() -> str | None:
+            return helper(tape, *operands)
+
+        if tape._entries is not None:
+            return tape.build(tape._mapped(helper.__name__, operands, body))
+        if tape.fragments is None:
+            return tape.build(body)
+        return tape.build(
+            lambda: tape.fragments.generate(tape, wrapper, operands, body)
+        )
+
+    return wrapper
 
 
+@fragment
 def op_decrement(tape: TapeStack, var: Variable) -> str:
-    return tape.seek(var) + "-"
+    if tape._fold(var, -1):
+        return ""
+    return tape._touch(var) + tape.seek(var) + "-"
 
 
+@fragment
 def op_increment(tape: TapeStack, var: Variable) -> str:
-    return tape.seek(var) + "+"
+    if tape._fold(var, 1):
+        return ""
+    return tape._touch(var) + tape.seek(var) + "+"
 
 
+@fragment
 def op_input(tape: TapeStack, var: Variable) -> str:
-    return tape.seek(var) + ","
+    return tape._touch(var, overwrite=True) + tape.seek(var) + ","
 
 
+@fragment
 def op_output(tape: TapeStack, var: Variable) -> str:
-    return tape.seek(var) + "."
-
+    return tape._materialize(var) + tape.seek(var) + "."
+
+
+@fragment
+def op_while(tape, condition: Variable, body: Callable[[], str]) -> None:
+    if tape._constants:
+        value = tape._value(condition)
+        if value == 0 or value is not None and tape._evaluate(condition, body):
+            return
+        tape.emit(tape._flush())
+        saved = tape._enter_loop()
+    tape.emit(tape.seek(condition) + "[")
+    tape._loop_depth += 1
+    tape._generate(body)
+    if tape._constants:
+        tape.emit(tape._flush())
+    tape.emit(tape.seek(condition) + "]")
+    tape._loop_depth -= 1
+    if tape._constants:
+        tape._leave_loop(saved)
+        tape._values[condition.position] = 0
+
+
+@fragment
+def op_clear(tape: TapeStack, var: Variable) -> str:
+    return op_while(tape, var, lambda: op_decrement(tape, var))
 
-def op_while(tape, condition: Variable, body: Callable[[], str]) -> str:
-    return tape.seek(condition) + "[" + body() + tape.seek(condition) + "]"
 
+@fragment
+def op_set_constant(tape: TapeStack, var: Variable, value: int) -> str:
+    """
+    Sets the cell to ``value`` with the shortest code found under the cell
+    semantics of the tape. Candidates are a run of increments or
+    decrements and a loop that multiplies a counter in a scratch cell,
+    both either after clearing the cell or, if its value is known, starting
+    from that value.
+    """
+    return tape._set_constant(var, value)
 
-def op_clear(tape: TapeStack, var: Variable) -> str:
-    return op_while(tape, var, lambda: op_decrement(tape, var))
 
+@fragment
+def op_if(tape, condition: Variable, body: Callable[[], str]) -> None:
+    def cleared() -> None:
+        tape._generate(body)
+        op_clear(tape, condition)
 
-def op_if(tape, condition: Variable, body: Callable[[], str]) -> str:
-    return op_while(tape, condition, lambda: body() + op_clear(tape, condition))
+    op_while(tape, condition, cleared)
 
 
+@fragment
 def op_accumulate(tape: TapeStack, accumulator: Variable, summand: Variable) -> str:
     return op_while(
         tape,
@@ -69,6 +580,7 @@ def op_accumulate(tape: TapeStack, accumulator: Variable, summand: Variable) ->
     )
 
 
+@fragment
 def op_subtract(tape: TapeStack, accumulator: Variable, summand: Variable) -> str:
     return op_while(
         tape,
@@ -77,6 +589,7 @@ def op_subtract(tape: TapeStack, accumulator: Variable, summand: Variable) -> st
     )
 
 
+@cached_fragment
 def fn_copy(tape: TapeStack, destination: Variable, source: Variable) -> str:
     temp = tape.register_variable()
     code = (
@@ -97,6 +610,7 @@ def fn_copy(tape: TapeStack, destination: Variable, source: Variable) -> str:
     return code
 
 
+@cached_fragment
 def fn_plus(tape: TapeStack, result: Variable, left: Variable, right: Variable) -> str:
     left_copy = tape.register_variable()
     right_copy = tape.register_variable()
@@ -112,6 +626,21 @@ def fn_plus(tape: TapeStack, result: Variable, left: Variable, right: Variable)
     return code
 
 
+@fragment
+def fn_add_constant(
+    tape: TapeStack, result: Variable, operand: Variable, amount: int
+) -> str:
+    """
+    Sets ``result`` to ``operand`` plus ``amount``, which may be negative.
+    The amount is added like in ``op_set_constant``. ``result`` may be
+    ``operand``.
+    """
+    if result is not operand:
+        fn_copy(tape, result, operand)
+    tape.emit(tape._add_constant(result, amount))
+
+
+@cached_fragment
 def fn_minus(tape: TapeStack, result: Variable, left: Variable, right: Variable) -> str:
     left_copy = tape.register_variable()
     right_copy = tape.register_variable()
@@ -127,6 +656,7 @@ def fn_minus(tape: TapeStack, result: Variable, left: Variable, right: Variable)
     return code
 
 
+@cached_fragment
 def fn_multiply(
     tape: TapeStack, result: Variable, left: Variable, right: Variable
 ) -> str:
@@ -153,6 +683,7 @@ def fn_multiply(
     return code
 
 
+@cached_fragment
 def fn_not(tape: TapeStack, result: Variable, condition: Variable) -> str:
     condition_copy = tape.register_variable()
     code = (
@@ -165,6 +696,7 @@ def fn_not(tape: TapeStack, result: Variable, condition: Variable) -> str:
     return code
 
 
+@cached_fragment
 def fn_and(tape: TapeStack, result: Variable, left: Variable, right: Variable) -> str:
     left_copy = tape.register_variable()
     right_copy = tape.register_variable()
@@ -183,6 +715,7 @@ def fn_and(tape: TapeStack, result: Variable, left: Variable, right: Variable) -
     return code
 
 
+@cached_fragment
 def fn_or(tape: TapeStack, result: Variable, left: Variable, right: Variable) -> str:
     left_copy = tape.register_variable()
     right_copy = tape.register_variable()
@@ -202,6 +735,7 @@ def fn_or(tape: TapeStack, result: Variable, left: Variable, right: Variable) ->
     return code
 
 
+@cached_fragment
 def op_subtract_smaller(tape: TapeStack, left: Variable, right: Variable) -> str:
     temp_and = tape.register_variable()
     cond = lambda: fn_and(tape, temp_and, left, right)
@@ -214,6 +748,7 @@ def op_subtract_smaller(tape: TapeStack, left: Variable, right: Variable) -> str
     return code
 
 
+@cached_fragment
 def fn_less(tape: TapeStack, result: Variable, left: Variable, right: Variable) -> str:
     left_copy = tape.register_variable()
     right_copy = tape.register_variable()
@@ -232,6 +767,7 @@ def fn_less(tape: TapeStack, result: Variable, left: Variable, right: Variable)
     return code
 
 
+@cached_fragment
 def fn_less_equals(
     tape: TapeStack, result: Variable, left: Variable, right: Variable
 ) -> str:
@@ -249,18 +785,21 @@ def fn_less_equals(
     return code
 
 
+@cached_fragment
 def fn_greater(
     tape: TapeStack, result: Variable, left: Variable, right: Variable
 ) -> str:
     return fn_less(tape, result, right, left)
 
 
+@cached_fragment
 def fn_greater_equals(
     tape: TapeStack, result: Variable, left: Variable, right: Variable
 ) -> str:
     return fn_less_equals(tape, result, right, left)
 
 
+@cached_fragment
 def fn_divide(
     tape: TapeStack,
     quotient: Variable,
@@ -289,3 +828,161 @@ def fn_divide(
     )
     tape.unregister_variable(has_remainder)
     return code
+
+
+@fragment
+def _op_branch(
+    tape: TapeStack,
+    condition: Variable,
+    nonzero: Callable[[], str],
+    zero: Callable[[], str],
+) -> None:
+    """
+    Runs ``nonzero`` or ``zero`` depending on ``condition`` without
+    consuming it, in a constant number of steps.
+
+    The pointer leaves the loops at a different cell depending on the
+    branch taken and both paths meet again two cells further. This needs
+    two scratch cells directly behind the condition, so the condition has
+    to be the most recently registered variable. Neither body may touch
+    those cells.
+    """
+    if tape._constants:
+        value = tape._value(condition)
+        if value is not None:
+            tape._generate(nonzero if value else zero)
+            return
+    flag = tape.register_variable()
+    guard = tape.register_variable()
+    assert flag.position == condition.position + 1
+    assert guard.position == condition.position + 2
+    op_clear(tape, guard)
+    op_clear(tape, flag)
+    op_increment(tape, flag)
+    if tape._constants:
+        tape.emit(tape._flush())
+        saved = tape._enter_loop()
+        tape._note_write(flag.position)
+    tape.emit(tape.seek(condition) + "[")
+    tape._generate(nonzero)
+    tape.emit(tape._flush())
+    tape.emit(tape.seek(flag) + "-]>[<")
+    tape._position = condition.position
+    if tape._constants:
+        # The zero branch must not see values left by the nonzero one.
+        # Writes of both branches end up in the same set.
+        tape._values, tape._default = {}, None
+    tape._generate(zero)
+    tape.emit(tape._flush())
+    tape.emit(tape.seek(flag) + "->]<<")
+    tape._position = condition.position
+    if tape._constants:
+        tape._leave_loop(saved)
+    tape.unregister_variable(guard)
+    tape.unregister_variable(flag)
+
+
+@cached_fragment
+def fn_multiply_fast(
+    tape: TapeStack, result: Variable, left: Variable, right: Variable
+) -> str:
+    """
+    Multiplies by moving the count of ``right`` back and forth between two
+    cells, adding to the result on every pass. Steps grow with the product
+    only, whereas ``fn_multiply`` copies ``right`` three times per unit of
+    ``left``.
+
+    Like ``fn_multiply``, it adds the product to ``result``, which may be
+    one of the operands.
+    """
+    forth = tape.register_variable()
+    back = tape.register_variable()
+    counter = tape.register_variable()
+    code = (
+        fn_copy(tape, forth, right)
+        + op_clear(tape, back)
+        + fn_copy(tape, counter, left)
+        + op_while(
+            tape,
+            counter,
+            lambda: (
+                op_decrement(tape, counter)
+                + _op_transfer(tape, forth, result, back)
+                + _op_branch(
+                    tape,
+                    counter,
+                    lambda: (
+                        op_decrement(tape, counter)
+                        + _op_transfer(tape, back, result, forth)
+                    ),
+                    lambda: op_accumulate(tape, forth, back),
+                )
+            ),
+        )
+    )
+    tape.unregister_variable(counter)
+    tape.unregister_variable(back)
+    tape.unregister_variable(forth)
+    return code
+
+
+@fragment
+def _op_transfer(
+    tape: TapeStack, source: Variable, first: Variable, second: Variable
+) -> str:
+    return op_while(
+        tape,
+        source,
+        lambda: (
+            op_decrement(tape, source)
+            + op_increment(tape, first)
+            + op_increment(tape, second)
+        ),
+    )
+
+
+@cached_fragment
+def fn_divide_fast(
+    tape: TapeStack,
+    quotient: Variable,
+    remainder: Variable,
+    dividend: Variable,
+    divisor: Variable,
+) -> str:
+    """
+    Divides by counting the dividend down once while a second counter runs
+    from the divisor to zero. Whenever it reaches zero, the quotient is
+    incremented and the remainder moved back into the counter. Steps are
+    linear in the dividend, whereas ``fn_divide`` takes roughly quadratic
+    time. A zero divisor fails the tape assertion instead of looping
+    forever.
+    """
+    counter = tape.register_variable()
+    countdown = tape.register_variable()
+    code = (
+        fn_copy(tape, counter, dividend)
+        + fn_copy(tape, countdown, divisor)
+        + op_clear(tape, quotient)
+        + op_clear(tape, remainder)
+        + op_while(
+            tape,
+            counter,
+            lambda: (
+                op_decrement(tape, counter)
+                + op_increment(tape, remainder)
+                + op_decrement(tape, countdown)
+                + _op_branch(
+                    tape,
+                    countdown,
+                    lambda: "",
+                    lambda: (
+                        op_increment(tape, quotient)
+                        + op_accumulate(tape, countdown, remainder)
+                    ),
+                )
+            ),
+        )
+    )
+    tape.unregister_variable(countdown)
+    tape.unregister_variable(counter)
+    return code
@@ -0,0 +1,353 @@
+from typing import Iterator
+
+ADD = 0
+MOVE = 1
+JZ = 2
+JNZ = 3
+IN = 4
+OUT = 5
+CLEAR = 6
+MULADD = 7
+SCAN = 8
+# Offset addressed forms, produced by ``address_offsets``. The argument
+# starts with the offset of the cell from the pointer.
+ADDAT = 9
+SETAT = 10
+INAT = 11
+OUTAT = 12
+MULADDAT = 13
+
+Instruction = tuple[int, int]
+
+_RUNS = {"+": (ADD, 1), "-": (ADD, -1), ">": (MOVE, 1), "<": (MOVE, -1)}
+
+
+def match_brackets(program: str) -> dict[int, int]:
+    brackets = {}
+    open_positions = []
+    for position, instruction in enumerate(program):
+        if instruction == "[":
+            open_positions.append(position)
+        elif instruction == "]":
+            if not open_positions:
+                raise ValueError(f"Unmatched ']' at position {position}")
+            partner = open_positions.pop()
+            brackets[partner] = position
+            brackets[position] = partner
+    if open_positions:
+        raise ValueError(f"Unmatched '[' at position {open_positions[-1]}")
+    return brackets
+
+
+def compile_program(
+    program: str, idioms: bool = True, offsets: bool = False
+) -> list[Instruction]:
+    return compile_with_positions(program, idioms, offsets)[0]
+
+
+def compile_with_positions(
+    program: str, idioms: bool = True, offsets: bool = False
+) -> tuple[list[Instruction], list[int]]:
+    """
+    Translates Brainfuck source into a flat instruction list.
+
+    Runs of the same character are folded into a single ``ADD`` or ``MOVE``
+    with a count. Runs are never merged across different characters, such
+    that ``-+`` on a zero cell still fails like it does in the tape. Jump
+    arguments are the index to continue at, that is the instruction after
+    the matching bracket for ``JZ`` and the first instruction of the loop
+    body for ``JNZ``.
+
+    With ``idioms`` enabled, simple loops are replaced by a single
+    instruction, see ``recognize_loop``.
+
+    With ``offsets`` enabled, the result is passed through
+    ``address_offsets``.
+
+    Next to the instructions, the position in the source each of them
+    starts at is returned. For loops that is the opening bracket.
+    """
+    compiler = Compiler(idioms)
+    compiler.feed(program)
+    code, positions = compiler.finish()
+    if offsets:
+        return address_offsets(code, positions)
+    return code, positions
+
+
+class Compiler:
+    """
+    Incremental form of ``compile_with_positions``.
+
+    Source is passed in chunks of any size to ``feed``, which translates
+    them right away, so the program never has to exist as one string.
+    Runs and loops may span chunks. ``finish`` checks that all loops were
+    closed and returns the instructions and positions.
+    """
+
+    def __init__(self, idioms: bool = True) -> None:
+        self.code: list[Instruction] = []
+        self.positions: list[int] = []
+        self._idioms = idioms
+        self._open_loops: list[tuple[int, int]] = []
+        self._last_char: str | None = None
+        self._offset = 0
+
+    def feed(self, chunk: str) -> None:
+        code = self.code
+        positions = self.positions
+        open_loops = self._open_loops
+        last_char = self._last_char
+        for position, char in enumerate(chunk, self._offset):
+            if char in _RUNS:
+                op, arg = _RUNS[char]
+                if char == last_char:
+                    code[-1] = (op, code[-1][1] + arg)
+                else:
+                    code.append((op, arg))
+                    positions.append(position)
+                    last_char = char
+                continue
+            if char == "[":
+                open_loops.append((len(code), position))
+                code.append((JZ, -1))
+                positions.append(position)
+            elif char == "]":
+                if not open_loops:
+                    raise ValueError(f"Unmatched ']' at position {position}")
+                start, _ = open_loops.pop()
+                idiom = recognize_loop(code[start + 1 :]) if self._idioms else None
+                if idiom is None:
+                    code.append((JNZ, start + 1))
+                    positions.append(position)
+                    code[start] = (JZ, len(code))
+                else:
+                    del code[start + 1 :]
+                    del positions[start + 1 :]
+                    code[start] = idiom
+            elif char == ",":
+                code.append((IN, 0))
+                positions.append(position)
+            elif char == ".":
+                code.append((OUT, 0))
+                positions.append(position)
+            else:
+                continue
+            last_char = char
+        self._last_char = last_char
+        self._offset += len(chunk)
+
+    def finish(self) -> tuple[list[Instruction], list[int]]:
+        if self._open_loops:
+            raise ValueError(f"Unmatched '[' at position {self._open_loops[-1][1]}")
+        return self.code, self.positions
+
+
+def to_source(code: list[Instruction]) -> str:
+    """
+    Renders instructions back into Brainfuck source with the same
+    behavior. Idioms become their loops again, with the cells of a
+    ``MULADD`` visited in order of their offset.
+    """
+    return "".join(_source_chunks(code))
+
+
+def source_length(code: list[Instruction]) -> int:
+    return sum(map(len, _source_chunks(code)))
+
+
+def _source_chunks(code: list[Instruction]) -> Iterator[str]:
+    for op, arg in code:
+        if op == ADD:
+            yield _add(arg)
+        elif op == MOVE:
+            yield _move(arg)
+        elif op == JZ:
+            yield "["
+        elif op == JNZ:
+            yield "]"
+        elif op == IN:
+            yield ","
+        elif op == OUT:
+            yield "."
+        elif op == CLEAR:
+            yield "[-]"
+        elif op == SCAN:
+            yield "[" + _move(arg) + "]"
+        elif op == MULADD:
+            yield _multiply_add(arg)
+        elif op == ADDAT:
+            yield _move(arg[0]) + _add(arg[1]) + _move(-arg[0])
+        elif op == SETAT:
+            yield _move(arg[0]) + "[-]" + _add(arg[1]) + _move(-arg[0])
+        elif op == INAT:
+            yield _move(arg) + "," + _move(-arg)
+        elif op == OUTAT:
+            yield _move(arg) + "." + _move(-arg)
+        elif op == MULADDAT:
+            yield _move(arg[0]) + _multiply_add(arg[1]) + _move(-arg[0])
+
+
+def _multiply_add(pairs: tuple[tuple[int, int], ...]) -> str:
+    parts = ["[-"]
+    offset = 0
+    for target, factor in pairs:
+        parts.append(_move(target - offset) + _add(factor))
+        offset = target
+    parts.append(_move(-offset) + "]")
+    return "".join(parts)
+
+
+def _add(amount: int) -> str:
+    return "+" * amount if amount > 0 else "-" * -amount
+
+
+def _move(distance: int) -> str:
+    return ">" * distance if distance > 0 else "<" * -distance
+
+
+def address_offsets(
+    code: list[Instruction], positions: list[int]
+) -> tuple[list[Instruction], list[int]]:
+    """
+    Rewrites the instructions between jumps to address cells relative to
+    the pointer instead of moving it, such that each such block moves the
+    pointer at most once, right before the jump. Loop bodies with
+    balanced movement do not move it at all.
+
+    - ``ADD`` becomes ``ADDAT (offset, amount)``. Adds to the same cell
+      in the same direction with only moves in between are merged.
+    - ``CLEAR`` becomes ``SETAT (offset, 0)``, increments directly after it
+      are merged into the value.
+    - ``IN`` and ``OUT`` become ``INAT offset`` and ``OUTAT offset``.
+    - ``MULADD`` becomes ``MULADDAT (offset, pairs)``.
+
+    The order of the accesses is kept, so a decrement of zero fails like
+    before. Moving left of the tape fails when a cell there is accessed.
+    A block that only passes over such cells still moves there, before its
+    first input or output so that neither happens, otherwise at its end.
+    """
+    result: list[Instruction] = []
+    result_positions: list[int] = []
+    open_loops = []
+    offset = lowest = 0
+    touched = 0
+    block_start = 0
+
+    def add(instruction: Instruction, position: int) -> None:
+        result.append(instruction)
+        result_positions.append(position)
+
+    def hoist(position: int) -> None:
+        nonlocal offset, lowest, touched
+        if lowest < min(offset, touched):
+            add((MOVE, lowest), position)
+            offset -= lowest
+            lowest = touched = 0
+
+    def flush(position: int) -> None:
+        nonlocal offset, lowest, touched, block_start
+        hoist(position)
+        if offset:
+            add((MOVE, offset), position)
+        offset = lowest = touched = 0
+        block_start = len(result)
+
+    def merge(op: int, target: int) -> Instruction | None:
+        if len(result) > block_start and result[-1][0] == op:
+            if result[-1][1][0] == target:
+                return result[-1]
+        return None
+
+    for (op, arg), position in zip(code, positions):
+        if op == MOVE:
+            offset += arg
+            lowest = min(lowest, offset)
+            continue
+        if op in (JZ, JNZ, SCAN):
+            flush(position)
+            if op == JZ:
+                open_loops.append(len(result))
+                add((JZ, -1), position)
+            elif op == JNZ:
+                start = open_loops.pop()
+                add((JNZ, start + 1), position)
+                result[start] = (JZ, len(result))
+            else:
+                add((op, arg), position)
+            continue
+
+        touched = min(touched, offset)
+        if op == ADD:
+            previous = merge(ADDAT, offset)
+            if previous and (previous[1][1] > 0) == (arg > 0):
+                result[-1] = (ADDAT, (offset, previous[1][1] + arg))
+                continue
+            previous = merge(SETAT, offset)
+            if previous and arg > 0:
+                result[-1] = (SETAT, (offset, previous[1][1] + arg))
+                continue
+            add((ADDAT, (offset, arg)), position)
+        elif op == CLEAR:
+            add((SETAT, (offset, 0)), position)
+        elif op == IN:
+            hoist(position)
+            add((INAT, offset), position)
+        elif op == OUT:
+            hoist(position)
+            add((OUTAT, offset), position)
+        elif op == MULADD:
+            if not arg:
+                add((SETAT, (offset, 0)), position)
+                continue
+            touched = min(touched, offset + arg[0][0])
+            add((MULADDAT, (offset, arg)), position)
+    flush(positions[-1] if positions else 0)
+    return result, result_positions
+
+
+def recognize_loop(body: list[Instruction]) -> Instruction | None:
+    """
+    Replaces the body of a loop with a single instruction if it has a known
+    shape.
+
+    - ``[-]`` becomes ``CLEAR``.
+    - ``[>]`` and similar become ``SCAN`` with the stride as argument.
+    - Loops with balanced pointer movement that decrement the control cell
+      exactly once and otherwise only add to other cells become ``MULADD``,
+      or ``CLEAR`` if they add to no other cell.
+      The argument is a tuple of ``(offset, factor)`` pairs sorted by
+      offset. Each other cell has to change in one direction only, such
+      that the tape assertion fails exactly when the looped version would.
+    """
+    if body == [(ADD, -1)]:
+        return (CLEAR, 0)
+    if len(body) == 1 and body[0][0] == MOVE:
+        return (SCAN, body[0][1])
+
+    offset = 0
+    lowest = 0
+    deltas = {}
+    for op, arg in body:
+        if op == MOVE:
+            offset += arg
+            lowest = min(lowest, offset)
+        elif op == ADD:
+            deltas.setdefault(offset, []).append(arg)
+        else:
+            return None
+    if offset != 0 or deltas.pop(0, None) != [-1]:
+        return None
+    pairs = []
+    for target, changes in sorted(deltas.items()):
+        if not (
+            all(change > 0 for change in changes)
+            or all(change < 0 for change in changes)
+        ):
+            return None
+        pairs.append((target, sum(changes)))
+    if lowest < min([0] + [target for target, _ in pairs]):
+        return None
+    if not pairs:
+        return (CLEAR, 0)
+    return (MULADD, tuple(pairs))
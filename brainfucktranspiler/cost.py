@@ -0,0 +1,285 @@
+"""
+Cost models of the codegen helpers.
+
+The size of a helper is computed exactly by generating its code for the
+actual placement of the operands. The steps are not derived from the code:
+``fit_cost_model`` runs the helper in the interpreter on a grid of operand
+values and fits a formula to the measured counts. Fitting therefore
+executes the helper many times, only the fitted model predicts without
+running.
+"""
+
+import dataclasses
+import inspect
+import itertools
+from fractions import Fraction
+from typing import Callable
+
+from . import codegen
+from .compiler import compile_program
+from .interpreter import RightInfiniteTape, StateMachine
+
+Values = dict[str, int]
+Term = tuple[str, Callable[[Values], int]]
+
+
+@dataclasses.dataclass(frozen=True)
+class _Shape:
+    inputs: tuple[str, ...]
+    terms: tuple[Term, ...]
+    valid: Callable[[Values], bool] = lambda values: True
+    sample: int = 6
+
+
+def _linear(*names: str) -> tuple[Term, ...]:
+    terms = [("1", lambda v: 1)]
+    for name in names:
+        terms.append((name, lambda v, name=name: v[name]))
+        terms.append((f"[{name}>0]", lambda v, name=name: int(v[name] > 0)))
+    return tuple(terms)
+
+
+def _comparison(left: str, right: str) -> tuple[Term, ...]:
+    def smaller(v: Values) -> int:
+        return min(v[left], v[right])
+
+    return _linear(left, right) + (
+        ("min", smaller),
+        (f"min*{left}", lambda v: smaller(v) * v[left]),
+        (f"min*{right}", lambda v: smaller(v) * v[right]),
+        ("min^2", lambda v: smaller(v) ** 2),
+        (f"[{left}>0 and {right}>0]", lambda v: int(v[left] > 0 and v[right] > 0)),
+        (f"[{left}>0]*{right}", lambda v: int(v[left] > 0) * v[right]),
+        (f"[{left}<{right}]", lambda v: int(v[left] < v[right])),
+        (f"[{left}>{right}]", lambda v: int(v[left] > v[right])),
+    )
+
+
+def _division() -> tuple[Term, ...]:
+    def q(v: Values) -> int:
+        return v["dividend"] // v["divisor"]
+
+    def r(v: Values) -> int:
+        return v["dividend"] % v["divisor"]
+
+    d = lambda v: v["divisor"]
+    return _linear("dividend", "divisor") + (
+        ("q", q),
+        ("r", r),
+        ("[r>0]", lambda v: int(r(v) > 0)),
+        ("q*divisor", lambda v: q(v) * d(v)),
+        ("q*dividend", lambda v: q(v) * v["dividend"]),
+        ("q^2*divisor", lambda v: q(v) ** 2 * d(v)),
+        ("q*divisor^2", lambda v: q(v) * d(v) ** 2),
+        ("q*divisor*dividend", lambda v: q(v) * d(v) * v["dividend"]),
+        ("q^2*divisor^2", lambda v: q(v) ** 2 * d(v) ** 2),
+        ("r^2", lambda v: r(v) ** 2),
+        ("r*divisor", lambda v: r(v) * d(v)),
+        ("divisor^2", lambda v: d(v) ** 2),
+    )
+
+
+def _product(left: str, right: str) -> tuple[Term, ...]:
+    return _linear(left, right) + (
+        (f"{left}*{right}", lambda v: v[left] * v[right]),
+        (f"[{left} odd]", lambda v: v[left] % 2),
+        (f"[{left} odd]*{right}", lambda v: v[left] % 2 * v[right]),
+    )
+
+
+_binary = _Shape(("left", "right"), _linear("left", "right"))
+_compare = _Shape(("left", "right"), _comparison("left", "right"))
+_divide = _Shape(
+    ("dividend", "divisor"),
+    _division(),
+    valid=lambda v: v["divisor"] > 0,
+    sample=16,
+)
+
+SHAPES: dict[str, _Shape] = {
+    "op_clear": _Shape(("var",), _linear("var"), sample=10),
+    "op_accumulate": _Shape(("summand",), _linear("summand"), sample=10),
+    "fn_copy": _Shape(("source",), _linear("source"), sample=10),
+    "fn_not": _Shape(("condition",), _linear("condition"), sample=10),
+    "fn_plus": _binary,
+    "fn_minus": dataclasses.replace(_binary, valid=lambda v: v["left"] >= v["right"]),
+    "fn_and": _compare,
+    "fn_or": _compare,
+    "fn_multiply": _Shape(("left", "right"), _product("left", "right")),
+    "fn_multiply_fast": _Shape(("left", "right"), _product("left", "right")),
+    "op_subtract_smaller": _compare,
+    "fn_less": _compare,
+    "fn_less_equals": _compare,
+    "fn_greater": _compare,
+    "fn_greater_equals": _compare,
+    "fn_divide": _divide,
+    "fn_divide_fast": _divide,
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class CostModel:
+    """
+    Size and executed steps of one helper.
+
+    ``size`` returns the exact number of characters the helper emits.
+    ``terms`` expresses the steps as a weighted sum of terms in the values
+    of the input operands, ``q`` and ``r`` being quotient and remainder.
+    The weights are fitted to measurements, see ``fit_cost_model``.
+    Output and scratch cells are assumed to be zero on entry.
+    """
+
+    helper: str
+    inputs: tuple[str, ...]
+    terms: tuple[tuple[str, Fraction], ...]
+    _shape: _Shape = dataclasses.field(repr=False, compare=False)
+    _generate: Callable[..., str] = dataclasses.field(repr=False, compare=False)
+
+    def size(self, tape: codegen.TapeStack, *operands: codegen.Variable) -> int:
+        """
+        Returns the number of characters the helper emits when called with
+        ``operands`` on ``tape`` at this point. The code depends on where
+        the operands are relative to the cursor, so it is generated on a
+        scratch tape in the same state, ``tape`` itself is not changed.
+        """
+        scratch = codegen.TapeStack(
+            cache_size=0, constants=tape._constants, cells=tape._cells
+        )
+        for _ in tape._stack:
+            scratch.register_variable()
+        scratch._position = tape._position
+        scratch._values = dict(tape._values)
+        scratch._default = tape._default
+        scratch._pending = dict(tape._pending)
+        variables = [scratch._stack[operand.position] for operand in operands]
+        return len(self._generate(scratch, *variables))
+
+    def steps(self, **values: int) -> int:
+        assert set(values) == set(self.inputs), f"Expected {self.inputs}"
+        weights = dict(self.terms)
+        total = sum(
+            weights[name] * term(values)
+            for name, term in self._shape.terms
+            if name in weights
+        )
+        assert total.denominator == 1
+        return int(total)
+
+    def worst_case(self, **limits: int) -> int:
+        """
+        Returns the most steps over all valid operand values up to the
+        given inclusive limits.
+        """
+        ranges = [range(limits[name] + 1) for name in self.inputs]
+        return max(
+            self.steps(**values)
+            for values in _combinations(self.inputs, ranges)
+            if self._shape.valid(values)
+        )
+
+    def __str__(self) -> str:
+        formula = " + ".join(
+            str(weight) if name == "1" else f"{weight}*{name}"
+            for name, weight in self.terms
+        )
+        return f"{self.helper}: {formula or 0} steps"
+
+
+def fit_cost_model(helper: Callable[..., str], idioms: bool = True) -> CostModel:
+    """
+    Fits the cost model of a helper empirically. It is generated on a
+    fresh tape, with one variable per operand in order, run in the
+    interpreter on a grid of operand values, and the weights of its terms
+    are solved for from the measured step counts. The code itself is not
+    analyzed, so the model is only as good as the terms listed for the
+    helper in ``SHAPES``. Once fitted, it predicts steps without running.
+
+    Steps are counted in instructions of ``compile_program``, pass
+    ``idioms=False`` to count every executed character instead, as
+    ``StateMachine.step`` does.
+
+    Raises ``ValueError`` if the steps are not a combination of the terms.
+    """
+    shape = SHAPES[helper.__name__]
+    operands = list(inspect.signature(helper).parameters)[1:]
+    tape = codegen.TapeStack()
+    variables = [tape.register_variable() for _ in operands]
+    code = helper(tape, *variables)
+    compiled = compile_program(code) if idioms else None
+    positions = {name: variable.position for name, variable in zip(operands, variables)}
+
+    rows = []
+    targets = []
+    ranges = [range(shape.sample)] * len(shape.inputs)
+    for values in _combinations(shape.inputs, ranges):
+        if not shape.valid(values):
+            continue
+        rows.append([Fraction(term(values)) for _, term in shape.terms])
+        targets.append(Fraction(_measure(code, compiled, positions, values)))
+    weights = _solve(rows, targets)
+    if weights is None:
+        raise ValueError(f"Steps of {helper.__name__} do not fit its terms")
+    return CostModel(
+        helper.__name__,
+        shape.inputs,
+        tuple(
+            (name, weight) for (name, _), weight in zip(shape.terms, weights) if weight
+        ),
+        shape,
+        helper,
+    )
+
+
+def _combinations(names: tuple[str, ...], ranges: list[range]) -> list[Values]:
+    return [dict(zip(names, values)) for values in itertools.product(*ranges)]
+
+
+def _measure(
+    code: str, compiled: list | None, positions: dict[str, int], values: Values
+) -> int:
+    """
+    Runs the code with the operands preloaded and returns the executed
+    instructions of ``compiled``, or the executed characters if that is
+    ``None``.
+    """
+    tape = RightInfiniteTape()
+    tape._tape = [0] * (max(positions.values()) + 1)
+    for name, value in values.items():
+        tape._tape[positions[name]] = value
+    machine = StateMachine(code, [], tape=tape, code=compiled)
+    if compiled is not None:
+        machine.run()
+        return machine.steps
+    while machine._program_counter != len(code):
+        machine.step()
+    return machine.steps
+
+
+def _solve(rows: list[list[Fraction]], targets: list[Fraction]) -> list | None:
+    """
+    Solves the linear system exactly by Gauss-Jordan elimination. Free
+    weights are set to zero, ``None`` is returned if it is inconsistent.
+    """
+    matrix = [row + [target] for row, target in zip(rows, targets)]
+    width = len(rows[0])
+    pivots = []
+    rank = 0
+    for column in range(width):
+        pivot = next((i for i in range(rank, len(matrix)) if matrix[i][column]), None)
+        if pivot is None:
+            continue
+        matrix[rank], matrix[pivot] = matrix[pivot], matrix[rank]
+        lead = matrix[rank][column]
+        matrix[rank] = [value / lead for value in matrix[rank]]
+        for i, row in enumerate(matrix):
+            if i != rank and row[column]:
+                factor = row[column]
+                matrix[i] = [a - factor * b for a, b in zip(row, matrix[rank])]
+        pivots.append(column)
+        rank += 1
+    if any(row[-1] for row in matrix[rank:]):
+        return None
+    weights = [Fraction(0)] * width
+    for row, column in zip(matrix, pivots):
+        weights[column] = row[-1]
+    return weights
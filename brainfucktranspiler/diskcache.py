@@ -0,0 +1,208 @@
+import array
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+
+from .compiler import ADDAT, MULADD, MULADDAT, SETAT, Instruction, compile_program
+from .jit import generate_source
+from .tape import CellMode
+
+# Part of every key. Bump whenever the compiled form of a program changes.
+FORMAT_VERSION = 2
+
+_MAGIC = b"BFCC"
+_SUFFIX = ".bfc"
+# Magic, format version, flags, instruction count, length of the MULADD
+# pair pool, length of the JIT source in bytes and the key of the entry.
+_HEADER = struct.Struct("<4sHHQQQ32s")
+_IDIOMS = 1
+_OFFSETS = 2
+_WORD = array.array("q").itemsize
+
+
+class ProgramCache:
+    """
+    Content addressed directory of compiled programs.
+
+    An entry holds the instruction list of a program and optionally the
+    source generated for it by the JIT. Entries are keyed by a hash of the
+    program, ``FORMAT_VERSION`` and the compile options. Loading maps the
+    file and checks its header, the program is not parsed again.
+
+    Instructions are stored as triples of 64 bit integers. Pairs as in
+    ``ADDAT`` fill the last two, otherwise the last one is zero. For
+    ``MULADD``, the last two select a range of the ``(offset, factor)``
+    pairs that follow the instructions. ``MULADDAT`` stores its offset as
+    an extra pair in front of its range.
+
+    Writers create entries under a temporary name and rename them into
+    place, so concurrent processes never see partial entries. Hits refresh
+    the modification time of the entry and writes evict the least recently
+    used entries once the directory exceeds ``max_bytes``.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 2**20) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def compile(
+        self, program: str, idioms: bool = True, offsets: bool = False
+    ) -> list[Instruction]:
+        key = _key(program, idioms, offsets, None)
+        entry = self._load(key)
+        if entry is not None:
+            return entry[0]
+        code = compile_program(program, idioms, offsets)
+        self._store(key, _flags(idioms, offsets), code, "")
+        return code
+
+    def jit_source(self, program: str, cells: CellMode = CellMode.UNBOUNDED) -> str:
+        key = _key(program, True, True, cells)
+        entry = self._load(key)
+        if entry is not None:
+            return entry[1]
+        source = generate_source(self.compile(program, offsets=True), cells)
+        self._store(key, _flags(True, True), [], source)
+        return source
+
+    def size(self) -> int:
+        return sum(size for _, _, size in self._entries())
+
+    def _path(self, key: bytes) -> str:
+        return os.path.join(self.directory, key.hex() + _SUFFIX)
+
+    def _load(self, key: bytes) -> tuple[list[Instruction], str] | None:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                    entry = _decode(view, key)
+            os.utime(path)
+        except (OSError, ValueError):
+            entry = None
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def _store(
+        self, key: bytes, flags: int, code: list[Instruction], source: str
+    ) -> None:
+        words = array.array("q")
+        pool = array.array("q")
+        for op, arg in code:
+            if op == MULADD:
+                words.extend((op, len(pool) // 2, len(arg)))
+                for offset, factor in arg:
+                    pool.extend((offset, factor))
+            elif op == MULADDAT:
+                words.extend((op, len(pool) // 2, len(arg[1])))
+                pool.extend((arg[0], 0))
+                for offset, factor in arg[1]:
+                    pool.extend((offset, factor))
+            elif op in (ADDAT, SETAT):
+                words.extend((op, *arg))
+            else:
+                words.extend((op, arg, 0))
+        encoded = source.encode()
+        header = _HEADER.pack(
+            _MAGIC,
+            FORMAT_VERSION,
+            flags,
+            len(code),
+            len(pool),
+            len(encoded),
+            key,
+        )
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as file:
+                file.write(header)
+                file.write(words.tobytes())
+                file.write(pool.tobytes())
+                file.write(encoded)
+            os.replace(temporary, self._path(key))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        self._evict()
+
+    def _entries(self) -> list[tuple[float, str, int]]:
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def _flags(idioms: bool, offsets: bool) -> int:
+    return (_IDIOMS if idioms else 0) | (_OFFSETS if offsets else 0)
+
+
+def _key(program: str, idioms: bool, offsets: bool, cells: CellMode | None) -> bytes:
+    mode = cells.name if cells else ""
+    text = f"{FORMAT_VERSION}:{_flags(idioms, offsets)}:{mode}:{program}"
+    return hashlib.sha256(text.encode()).digest()
+
+
+def _decode(view: mmap.mmap, key: bytes) -> tuple[list[Instruction], str] | None:
+    if len(view) < _HEADER.size:
+        return None
+    magic, version, _, count, pool_size, source_size, stored = _HEADER.unpack_from(view)
+    words_end = _HEADER.size + 3 * count * _WORD
+    pool_end = words_end + pool_size * _WORD
+    if (
+        magic != _MAGIC
+        or version != FORMAT_VERSION
+        or stored != key
+        or len(view) != pool_end + source_size
+    ):
+        return None
+
+    memory = memoryview(view)
+    try:
+        words = memory[_HEADER.size : words_end].cast("q").tolist()
+        pool = memory[words_end:pool_end].cast("q").tolist()
+        source = bytes(memory[pool_end:]).decode()
+    finally:
+        memory.release()
+    code = []
+    for index in range(0, len(words), 3):
+        op, arg, extra = words[index : index + 3]
+        if op == MULADD:
+            arg = _pairs(pool, arg, extra)
+        elif op == MULADDAT:
+            arg = (pool[2 * arg], _pairs(pool, arg + 1, extra))
+        elif op in (ADDAT, SETAT):
+            arg = (arg, extra)
+        code.append((op, arg))
+    return code, source
+
+
+def _pairs(pool: list[int], start: int, count: int) -> tuple[tuple[int, int], ...]:
+    end = 2 * (start + count)
+    return tuple(zip(pool[2 * start : end : 2], pool[2 * start + 1 : end : 2]))
@@ -1,4 +1,73 @@
+import sys
+import time
+from typing import BinaryIO, Callable, Iterable, Iterator
+
+from .compiler import (
+    ADD,
+    ADDAT,
+    CLEAR,
+    IN,
+    INAT,
+    JNZ,
+    JZ,
+    MOVE,
+    MULADD,
+    MULADDAT,
+    OUT,
+    OUTAT,
+    SCAN,
+    SETAT,
+    Instruction,
+    compile_program,
+    match_brackets,
+    source_length,
+    to_source,
+)
+from .tape import ArrayTape, CellMode
+
+# Number of instructions between two looks at the clock when a timeout is set.
+_CLOCK_INTERVAL = 10_000
+
+# Yielded by ``StateMachine._execute`` besides outputs when the machine is
+# driven from outside, see ``aio.AsyncMachine``. After ``_NEED_INPUT``, the
+# input value is passed back in with ``send``.
+_PAUSE = object()
+_NEED_INPUT = object()
+
+
+class BudgetExceeded(RuntimeError):
+    pass
+
+
+def input_reader(inputs: Iterable[int] | BinaryIO) -> Callable[[], int]:
+    """
+    Returns a function that yields the next input on each call.
+
+    Inputs can be any iterable of numbers or a binary file-like object,
+    which is read in chunks. Reading past the end raises ``IndexError``.
+    """
+    if hasattr(inputs, "read"):
+        source = _stream_bytes(inputs)
+    else:
+        source = iter(inputs)
+
+    def read() -> int:
+        try:
+            return next(source)
+        except StopIteration:
+            raise IndexError("No input left") from None
+
+    return read
+
+
+def _stream_bytes(stream: BinaryIO, chunk_size: int = 4096) -> Iterator[int]:
+    while chunk := stream.read(chunk_size):
+        yield from chunk
+
+
 class RightInfiniteTape:
+    mode = CellMode.UNBOUNDED
+
     def __init__(self) -> None:
         self._tape = [0]
         self._cursor = 0
@@ -30,6 +99,11 @@ class RightInfiniteTape:
     def set(self, number: int) -> None:
         self._tape[self._cursor] = number
 
+    def _park(self, cursor: int) -> None:
+        self._cursor = cursor
+        while len(self._tape) - 1 > cursor and self._tape[-1] == 0:
+            self._tape.pop()
+
     def __str__(self) -> str:
         return " ".join(
             f"[{cell}]" if idx == self._cursor else f"{cell}"
@@ -38,15 +112,49 @@ class RightInfiniteTape:
 
 
 class StateMachine:
-    def __init__(self, program: str, inputs: list[int]) -> None:
+    def __init__(
+        self,
+        program: str | None,
+        inputs: Iterable[int] | BinaryIO,
+        tape: RightInfiniteTape | ArrayTape | None = None,
+        sink: Callable[[int], None] | None = None,
+        max_steps: int | None = None,
+        timeout: float | None = None,
+        code: list[Instruction] | None = None,
+    ) -> None:
+        """
+        The program may be ``None`` if its compiled ``code`` is given. The
+        source is then only rendered from the code if ``step`` is used.
+
+        ``steps`` and ``max_steps`` count executed instructions, whose unit
+        depends on how the program runs. ``step`` executes one character of
+        the source, ``run`` and ``outputs`` one compiled instruction, which
+        may stand for a run of characters or a whole loop. The same budget
+        therefore allows much more work in ``run``.
+        """
+        assert program is not None or code is not None, "No program given"
         self._program = program
-        self._inputs = inputs
+        self._code = compile_program(program, offsets=True) if code is None else code
+        self._read = input_reader(inputs)
 
-        self._tape = RightInfiniteTape()
+        self._tape = RightInfiniteTape() if tape is None else tape
         self._program_counter = 0
         self._outputs = []
+        self._sink = self._outputs.append if sink is None else sink
+        self._brackets = None
+
+        self.steps = 0
+        self._slice: int | None = None
+        self._max_steps = max_steps
+        self._timeout = timeout
+        self._deadline = None
 
     def step(self) -> None:
+        if self._brackets is None:
+            if self._program is None:
+                self._program = to_source(self._code)
+            self._brackets = match_brackets(self._program)
+        self.steps += 1
         instruction = self._program[self._program_counter]
         if instruction == "+":
             self._tape.increment()
@@ -57,24 +165,187 @@ class StateMachine:
         elif instruction == "<":
             self._tape.left()
         elif instruction == ",":
-            self._tape.set(self._inputs.pop(0))
+            self._tape.set(self._read())
         elif instruction == ".":
-            self._outputs.append(self._tape.get())
+            self._sink(self._tape.get())
         elif instruction == "[":
             if self._tape.is_zero():
-                self._goto_bracket(forward=True)
+                self._program_counter = self._brackets[self._program_counter]
         elif instruction == "]":
             if not self._tape.is_zero():
-                self._goto_bracket(forward=False)
+                self._program_counter = self._brackets[self._program_counter]
 
         self._program_counter += 1
 
     def run(self) -> list[int]:
-        while self._program_counter != len(self._program):
+        if self._program_counter == 0:
+            for value in self.outputs():
+                self._sink(value)
+            return self._outputs
+        end = self._program_length()
+        while self._program_counter != end:
             self.step()
+            self._check_budget(self.steps)
             # self._print()
         return self._outputs
 
+    def outputs(self) -> Iterator[int]:
+        """
+        Runs the program and yields every output as soon as it is emitted.
+
+        The outputs are neither stored nor passed to the sink.
+        """
+        assert self._program_counter == 0, "Cannot stream after stepping"
+        yield from self._execute(self._code)
+        self._program_counter = self._program_length()
+
+    def _program_length(self) -> int:
+        if self._program is None:
+            return source_length(self._code)
+        return len(self._program)
+
+    def _check_budget(self, steps: int) -> int:
+        """
+        Raises if the step budget or the deadline is exhausted, otherwise
+        returns the step count at which to check again.
+        """
+        if self._max_steps is not None and steps > self._max_steps:
+            raise BudgetExceeded(f"Exceeded the budget of {self._max_steps} steps")
+        checkpoint = sys.maxsize if self._max_steps is None else self._max_steps
+        if self._timeout is not None:
+            now = time.monotonic()
+            if self._deadline is None:
+                self._deadline = now + self._timeout
+            elif now > self._deadline:
+                raise BudgetExceeded(f"Exceeded the timeout of {self._timeout} s")
+            checkpoint = min(checkpoint, steps + _CLOCK_INTERVAL)
+        if self._slice is not None:
+            checkpoint = min(checkpoint, steps + self._slice)
+        return checkpoint
+
+    def _execute(self, code: list[Instruction]) -> Iterator[int]:
+        steps = self.steps
+        checkpoint = self._check_budget(steps)
+        tape = self._tape._tape
+        pointer = self._tape._cursor
+        modulus = self._tape.mode.modulus
+        read = self._read
+        program_counter = 0
+        end = len(code)
+        try:
+            while program_counter < end:
+                op, arg = code[program_counter]
+                program_counter += 1
+                steps += 1
+                if steps > checkpoint:
+                    checkpoint = self._check_budget(steps)
+                    if self._slice is not None:
+                        yield _PAUSE
+                if op == ADDAT:
+                    target = pointer + arg[0]
+                    if target >= len(tape):
+                        tape.extend([0] * max(target + 1 - len(tape), len(tape)))
+                    assert target >= 0, str(self._tape)
+                    value = tape[target] + arg[1]
+                    if modulus:
+                        value %= modulus
+                    else:
+                        assert value >= 0, str(self._tape)
+                    tape[target] = value
+                elif op == JNZ:
+                    if tape[pointer]:
+                        program_counter = arg
+                elif op == JZ:
+                    if not tape[pointer]:
+                        program_counter = arg
+                elif op == MOVE:
+                    pointer += arg
+                    if pointer >= len(tape):
+                        tape.extend([0] * max(pointer + 1 - len(tape), len(tape)))
+                    assert pointer >= 0, str(self._tape)
+                elif op == ADD:
+                    value = tape[pointer] + arg
+                    if modulus:
+                        value %= modulus
+                    else:
+                        assert value >= 0, str(self._tape)
+                    tape[pointer] = value
+                elif op == CLEAR:
+                    tape[pointer] = 0
+                elif op == MULADD:
+                    value = tape[pointer]
+                    if value:
+                        for offset, factor in arg:
+                            target = pointer + offset
+                            assert target >= 0, str(self._tape)
+                            if target >= len(tape):
+                                tape.extend(
+                                    [0] * max(target + 1 - len(tape), len(tape))
+                                )
+                            total = tape[target] + factor * value
+                            if modulus:
+                                total %= modulus
+                            else:
+                                assert total >= 0, str(self._tape)
+                            tape[target] = total
+                        tape[pointer] = 0
+                elif op == SCAN:
+                    while tape[pointer]:
+                        pointer += arg
+                        if pointer >= len(tape):
+                            tape.extend([0] * max(pointer + 1 - len(tape), len(tape)))
+                        assert pointer >= 0, str(self._tape)
+                elif op == SETAT:
+                    target = pointer + arg[0]
+                    if target >= len(tape):
+                        tape.extend([0] * max(target + 1 - len(tape), len(tape)))
+                    assert target >= 0, str(self._tape)
+                    tape[target] = arg[1] % modulus if modulus else arg[1]
+                elif op == MULADDAT:
+                    control = pointer + arg[0]
+                    if control >= len(tape):
+                        tape.extend([0] * max(control + 1 - len(tape), len(tape)))
+                    assert control >= 0, str(self._tape)
+                    value = tape[control]
+                    if value:
+                        for offset, factor in arg[1]:
+                            target = control + offset
+                            assert target >= 0, str(self._tape)
+                            if target >= len(tape):
+                                tape.extend(
+                                    [0] * max(target + 1 - len(tape), len(tape))
+                                )
+                            total = tape[target] + factor * value
+                            if modulus:
+                                total %= modulus
+                            else:
+                                assert total >= 0, str(self._tape)
+                            tape[target] = total
+                        tape[control] = 0
+                elif op == IN:
+                    value = read()
+                    if value is None:
+                        value = yield _NEED_INPUT
+                    tape[pointer] = value % modulus if modulus else value
+                elif op == OUT:
+                    yield tape[pointer]
+                elif op == INAT:
+                    target = pointer + arg
+                    if target >= len(tape):
+                        tape.extend([0] * max(target + 1 - len(tape), len(tape)))
+                    assert target >= 0, str(self._tape)
+                    value = read()
+                    if value is None:
+                        value = yield _NEED_INPUT
+                    tape[target] = value % modulus if modulus else value
+                elif op == OUTAT:
+                    target = pointer + arg
+                    assert target >= 0, str(self._tape)
+                    yield tape[target] if target < len(tape) else 0
+        finally:
+            self.steps = steps
+            self._tape._park(max(pointer, 0))
+
     def _print(self) -> None:
         print(self._tape)
         print(
@@ -83,18 +354,3 @@ class StateMachine:
                 for idx, cell in enumerate(self._program)
             )
         )
-
-    def _goto_bracket(self, forward: bool) -> None:
-        my_bracket = "[" if forward else "]"
-        target_bracket = "]" if forward else "["
-        increment = 1 if forward else -1
-        bracket_counter = 0
-        while True:
-            instruction = self._program[self._program_counter]
-            if instruction == my_bracket:
-                bracket_counter += 1
-            elif instruction == target_bracket:
-                bracket_counter -= 1
-                if bracket_counter == 0:
-                    break
-            self._program_counter += increment
@@ -0,0 +1,221 @@
+import hashlib
+from typing import TYPE_CHECKING, Callable, Iterable
+
+from .compiler import (
+    ADD,
+    ADDAT,
+    CLEAR,
+    IN,
+    INAT,
+    JZ,
+    MOVE,
+    MULADD,
+    MULADDAT,
+    OUT,
+    OUTAT,
+    SCAN,
+    SETAT,
+    Instruction,
+    compile_program,
+)
+from .interpreter import input_reader
+from .tape import CellMode
+
+if TYPE_CHECKING:
+    from .diskcache import ProgramCache
+
+# CPython refuses more than 20 statically nested loops in one function, so
+# deeper loops are split off into functions of their own.
+MAX_NESTING = 16
+
+_ADDRESSED = (ADDAT, SETAT, INAT, OUTAT, MULADDAT)
+
+Runner = Callable[[Iterable[int]], list[int]]
+
+_cache: dict[str, Runner] = {}
+
+
+def jit_compile(
+    program: str,
+    cells: CellMode = CellMode.UNBOUNDED,
+    disk: "ProgramCache | None" = None,
+) -> Runner:
+    """
+    Generates and compiles a Python function running the program. With a
+    ``disk`` cache, the generated source is loaded from and stored to it.
+    """
+    key = hashlib.sha256(f"{cells.name}:{program}".encode()).hexdigest()
+    if key not in _cache:
+        if disk is None:
+            source = generate_source(compile_program(program, offsets=True), cells)
+        else:
+            source = disk.jit_source(program, cells)
+        namespace = {"allocate": cells.allocate, "input_reader": input_reader}
+        exec(compile(source, f"<brainfuck {key[:12]}>", "exec"), namespace)
+        runner = namespace["run"]
+        runner.source = source
+        _cache[key] = runner
+    return _cache[key]
+
+
+def generate_source(
+    code: list[Instruction], cells: CellMode = CellMode.UNBOUNDED
+) -> str:
+    functions = []
+    _Emitter(code, functions, cells.modulus).function("_main", 0, len(code))
+    if cells.modulus is None:
+        return "\n".join(functions) + _PRELUDE.format(tape="[0] * 64")
+    return "\n".join(functions) + _PRELUDE.format(tape="allocate(64)")
+
+
+_PRELUDE = """
+def run(inputs):
+    tape = {tape}
+    outputs = []
+    read_input = input_reader(inputs)
+    _main(tape, 0, outputs, read_input)
+    return outputs
+"""
+
+
+class _Emitter:
+    def __init__(
+        self, code: list[Instruction], functions: list[str], modulus: int | None
+    ) -> None:
+        self._code = code
+        self._functions = functions
+        self._modulus = modulus
+
+    def function(self, name: str, start: int, end: int) -> None:
+        lines = [f"def {name}(tape, p, outputs, read_input):"]
+        self._block(lines, start, end, 1, 0)
+        lines.append("    return p")
+        lines.append("")
+        self._functions.append("\n".join(lines))
+
+    def _block(
+        self, lines: list[str], start: int, end: int, indent: int, depth: int
+    ) -> None:
+        pad = "    " * indent
+        index = start
+        checked = start
+        while index < end:
+            op, arg = self._code[index]
+            if op in _ADDRESSED and index >= checked:
+                checked = self._check_run(lines, pad, index, end)
+            if op == JZ:
+                body_end = arg - 1
+                if depth == MAX_NESTING:
+                    name = f"_loop_{index}"
+                    lines.append(f"{pad}p = {name}(tape, p, outputs, read_input)")
+                    self.function(name, index, arg)
+                else:
+                    lines.append(f"{pad}while tape[p]:")
+                    self._block(lines, index + 1, body_end, indent + 1, depth + 1)
+                index = arg
+                continue
+            if op == MOVE:
+                lines.append(f"{pad}p += {arg}")
+                lines.extend(_bounds(pad, arg, "p"))
+            elif op == ADD:
+                lines.extend(self._add(pad, "p", str(arg)))
+            elif op == CLEAR:
+                lines.append(f"{pad}tape[p] = 0")
+            elif op == MULADD:
+                lines.extend(self._multiply_add(pad, 0, arg))
+            elif op == SCAN:
+                lines.append(f"{pad}while tape[p]:")
+                lines.append(f"{pad}    p += {arg}")
+                lines.extend(_bounds(pad + "    ", arg, "p"))
+            elif op == IN:
+                lines.extend(self._input(pad, "p"))
+            elif op == OUT:
+                lines.append(f"{pad}outputs.append(tape[p])")
+            elif op == ADDAT:
+                lines.extend(self._add(pad, _at(arg[0]), str(arg[1])))
+            elif op == SETAT:
+                offset, value = arg
+                if self._modulus is not None:
+                    value %= self._modulus
+                lines.append(f"{pad}tape[{_at(offset)}] = {value}")
+            elif op == INAT:
+                lines.extend(self._input(pad, _at(arg)))
+            elif op == OUTAT:
+                lines.append(f"{pad}outputs.append(tape[{_at(arg)}])")
+            elif op == MULADDAT:
+                lines.extend(self._multiply_add(pad, *arg))
+            index += 1
+        if start == end:
+            lines.append(f"{pad}pass")
+
+    def _check_run(self, lines: list[str], pad: str, start: int, end: int) -> int:
+        """
+        Checks the bounds of all cells accessed by the offset addressed
+        instructions from ``start`` on at once and returns where they end.
+        A run ends after input or output, such that a bad access never
+        fails before those happened. Only the control cell of a
+        ``MULADDAT`` counts, its targets are checked when it adds.
+        """
+        lowest = highest = 0
+        index = start
+        while index < end and self._code[index][0] in _ADDRESSED:
+            op, arg = self._code[index]
+            offset = arg if op in (INAT, OUTAT) else arg[0]
+            lowest = min(lowest, offset)
+            highest = max(highest, offset)
+            index += 1
+            if op in (INAT, OUTAT):
+                break
+        lines.extend(_bounds(pad, lowest, _at(lowest)))
+        lines.extend(_bounds(pad, highest, _at(highest)))
+        return index
+
+    def _multiply_add(
+        self,
+        pad: str,
+        control: int,
+        pairs: tuple[tuple[int, int], ...],
+    ) -> list[str]:
+        lines = [f"{pad}if tape[{_at(control)}]:"]
+        inner = pad + "    "
+        lines.append(f"{inner}value = tape[{_at(control)}]")
+        lowest, highest = control + pairs[0][0], control + pairs[-1][0]
+        lines.extend(_bounds(inner, lowest, _at(lowest)))
+        lines.extend(_bounds(inner, highest, _at(highest)))
+        for offset, factor in pairs:
+            lines.extend(self._add(inner, _at(control + offset), f"{factor} * value"))
+        lines.append(f"{inner}tape[{_at(control)}] = 0")
+        return lines
+
+    def _input(self, pad: str, position: str) -> list[str]:
+        if self._modulus is None:
+            return [f"{pad}tape[{position}] = read_input()"]
+        return [f"{pad}tape[{position}] = read_input() % {self._modulus}"]
+
+    def _add(self, pad: str, position: str, amount: str) -> list[str]:
+        if self._modulus is not None:
+            cell = f"tape[{position}]"
+            return [f"{pad}{cell} = ({cell} + {amount}) % {self._modulus}"]
+        lines = [f"{pad}tape[{position}] += {amount}"]
+        if amount.startswith("-"):
+            lines.append(f"{pad}assert tape[{position}] >= 0")
+        return lines
+
+
+def _at(offset: int) -> str:
+    if offset > 0:
+        return f"p + {offset}"
+    if offset < 0:
+        return f"p - {-offset}"
+    return "p"
+
+
+def _bounds(pad: str, offset: int, position: str) -> list[str]:
+    if offset < 0:
+        return [f"{pad}assert {position} >= 0"]
+    if offset > 0:
+        return [
+            f"{pad}if {position} >= len(tape):",
+            f"{pad}    tape.extend([0] * ({position} + 1))",
+        ]
+    return []
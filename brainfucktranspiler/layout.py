@@ -0,0 +1,101 @@
+import dataclasses
+import itertools
+from typing import Callable
+
+from .codegen import TapeStack, Variable
+
+# Accesses inside a loop are weighted by this factor per nesting level.
+LOOP_WEIGHT = 10
+
+_START = -1
+
+
+@dataclasses.dataclass
+class LayoutReport:
+    cost_before: int
+    cost_after: int
+    positions: dict[int, int]
+
+
+def optimize_layout(build: Callable[[TapeStack], str]) -> tuple[str, LayoutReport]:
+    """
+    Generates a program twice to place its variables close to each other.
+
+    The first pass records which variables are accessed after each other,
+    weighted by loop nesting. Variables that are still registered at the
+    end are then permuted among their positions to minimize the weighted
+    pointer travel. Scratch variables keep their stack positions, so the
+    stack discipline is unaffected. The second pass generates the program
+    with the new positions.
+
+    Variables are identified by the order of registration, so ``build`` has
+    to register them in the same order on every call.
+    """
+    recording = _RecordingTapeStack({})
+    build(recording)
+    placed = recording.live_positions()
+    travel = recording.travel
+    fixed = {_START: 0} | recording.scratch_positions()
+
+    cost_before = _cost(travel, fixed | placed)
+    serials = list(placed)
+    improved = True
+    while improved:
+        improved = False
+        for first, second in itertools.combinations(serials, 2):
+            candidate = dict(placed)
+            candidate[first], candidate[second] = placed[second], placed[first]
+            if _cost(travel, fixed | candidate) < _cost(travel, fixed | placed):
+                placed = candidate
+                improved = True
+
+    code = build(_RecordingTapeStack(placed))
+    return code, LayoutReport(cost_before, _cost(travel, fixed | placed), placed)
+
+
+def _cost(travel: dict[tuple[int, int], int], positions: dict[int, int]) -> int:
+    return sum(
+        weight * abs(positions[source] - positions[target])
+        for (source, target), weight in travel.items()
+    )
+
+
+class _RecordingTapeStack(TapeStack):
+    def __init__(self, layout: dict[int, int]) -> None:
+        super().__init__(cache_size=0)
+        self.travel: dict[tuple[int, int], int] = {}
+        self._layout = layout
+        self._variables: list[Variable] = []
+        self._released: set[int] = set()
+        self._last = _START
+
+    def register_variable(self) -> Variable:
+        variable = super().register_variable()
+        variable.serial = len(self._variables)
+        variable.position = self._layout.get(variable.serial, variable.position)
+        self._variables.append(variable)
+        return variable
+
+    def unregister_variable(self, variable: Variable) -> None:
+        super().unregister_variable(variable)
+        self._released.add(variable.serial)
+
+    def seek(self, variable: Variable) -> str:
+        key = (self._last, variable.serial)
+        self.travel[key] = self.travel.get(key, 0) + LOOP_WEIGHT**self._loop_depth
+        self._last = variable.serial
+        return super().seek(variable)
+
+    def live_positions(self) -> dict[int, int]:
+        return {
+            variable.serial: variable.position
+            for variable in self._variables
+            if variable.serial not in self._released
+        }
+
+    def scratch_positions(self) -> dict[int, int]:
+        return {
+            variable.serial: variable.position
+            for variable in self._variables
+            if variable.serial in self._released
+        }
@@ -0,0 +1,430 @@
+import ctypes
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import warnings
+
+from .compiler import (
+    ADD,
+    ADDAT,
+    CLEAR,
+    IN,
+    INAT,
+    JZ,
+    MOVE,
+    MULADD,
+    MULADDAT,
+    OUT,
+    OUTAT,
+    SCAN,
+    SETAT,
+    Instruction,
+    compile_program,
+)
+from .jit import Runner, jit_compile
+from .tape import CellMode
+
+DIRECTORY = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+    "brainfucktranspiler",
+)
+
+_ADDRESSED = (ADDAT, SETAT, INAT, OUTAT, MULADDAT)
+
+_CELL_TYPES = {
+    CellMode.UNBOUNDED: "int64_t",
+    CellMode.WRAP8: "uint8_t",
+    CellMode.WRAP16: "uint16_t",
+    CellMode.WRAP32: "uint32_t",
+}
+
+# Status codes returned by the generated ``bf_run``.
+_DONE = 0
+_OUTPUT_FULL = 1
+_UNDERFLOW = 2
+_LEFT_OF_TAPE = 3
+_NO_INPUT = 4
+_NO_MEMORY = 5
+
+_ERRORS = {
+    _UNDERFLOW: lambda: AssertionError("Decremented a zero cell"),
+    _LEFT_OF_TAPE: lambda: AssertionError("Moved left of the tape"),
+    _NO_INPUT: lambda: IndexError("No input left"),
+    _NO_MEMORY: lambda: MemoryError("Cannot grow the tape"),
+}
+
+_cache: dict[str, Runner] = {}
+
+
+class _State(ctypes.Structure):
+    _fields_ = [
+        ("tape", ctypes.c_void_p),
+        ("size", ctypes.c_int64),
+        ("p", ctypes.c_int64),
+        ("in_pos", ctypes.c_int64),
+        ("out_len", ctypes.c_int64),
+        ("resume", ctypes.c_int64),
+    ]
+
+
+def find_compiler() -> str | None:
+    """
+    Returns the path of the C compiler named by ``$CC``, ``cc`` by
+    default, or ``None`` if there is none.
+    """
+    return shutil.which(os.environ.get("CC", "cc"))
+
+
+def native_compile(
+    program: str,
+    cells: CellMode = CellMode.UNBOUNDED,
+    directory: str = DIRECTORY,
+) -> Runner:
+    """
+    Translates the program to C, builds it into a shared library in
+    ``directory`` and returns a function running it through ``ctypes``.
+    Libraries are named by a hash of their C source, so they are built
+    once and shared between processes. They are cached per user in
+    ``DIRECTORY``, a directory or library that others could have written
+    to is not used.
+
+    The tape starts small and grows on demand like in the other engines.
+    With ``CellMode.UNBOUNDED``, cells are 64 bit integers, decrementing a
+    zero cell and moving left of the tape raise ``AssertionError``.
+    Otherwise the cells are unsigned integers of the given width.
+
+    Without a working C compiler, ``jit_compile`` is used instead and a
+    ``RuntimeWarning`` says why.
+    """
+    key = hashlib.sha256(f"{cells.name}:{directory}:{program}".encode()).hexdigest()
+    if key not in _cache:
+        compiler = find_compiler()
+        if compiler is None:
+            warnings.warn("No C compiler found, using the JIT", RuntimeWarning)
+            return jit_compile(program, cells)
+        source = generate_c(compile_program(program, offsets=True), cells)
+        try:
+            library = ctypes.CDLL(_build(compiler, source, directory))
+        except subprocess.CalledProcessError as error:
+            message = error.stderr.decode(errors="replace")
+            warnings.warn(
+                f"Compiling C failed, using the JIT:\n{message}", RuntimeWarning
+            )
+            return jit_compile(program, cells)
+        except OSError as error:
+            warnings.warn(f"Loading C failed, using the JIT: {error}", RuntimeWarning)
+            return jit_compile(program, cells)
+        _cache[key] = _runner(library, source, cells)
+    return _cache[key]
+
+
+def _build(compiler: str, source: str, directory: str) -> str:
+    """
+    Returns the path of the library built from ``source``, building it if
+    needed. Loading a library runs its code, so the directory and the
+    library have to belong to the current user and must not be writable
+    by anyone else, otherwise ``PermissionError`` is raised.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    _check_private(directory)
+    name = hashlib.sha256(source.encode()).hexdigest()
+    path = os.path.join(directory, name + ".so")
+    if os.path.exists(path):
+        _check_private(path)
+        return path
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(handle)
+    try:
+        subprocess.run(
+            [compiler, "-O2", "-shared", "-fPIC", "-x", "c", "-o", temporary, "-"],
+            input=source.encode(),
+            check=True,
+            capture_output=True,
+        )
+        os.chmod(temporary, 0o700)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return path
+
+
+def _check_private(path: str) -> None:
+    status = os.lstat(path)
+    if status.st_uid != os.getuid() or status.st_mode & 0o022:
+        raise PermissionError(
+            f"{path} has to be owned by the current user and not writable "
+            "by group or others"
+        )
+
+
+def _runner(library: ctypes.CDLL, source: str, cells: CellMode) -> Runner:
+    bf_run = library.bf_run
+    bf_run.restype = ctypes.c_int
+    bf_run.argtypes = [
+        ctypes.POINTER(_State),
+        ctypes.POINTER(ctypes.c_int64),
+        ctypes.c_int64,
+        ctypes.POINTER(ctypes.c_int64),
+        ctypes.c_int64,
+    ]
+    bf_release = library.bf_release
+    bf_release.restype = None
+    bf_release.argtypes = [ctypes.POINTER(_State)]
+
+    def run(inputs) -> list[int]:
+        values = list(inputs)
+        if cells.modulus is not None:
+            values = [value % cells.modulus for value in values]
+        input_array = (ctypes.c_int64 * len(values))(*values)
+        output_array = (ctypes.c_int64 * 256)()
+        outputs = []
+        state = _State()
+        try:
+            while True:
+                state.out_len = 0
+                status = bf_run(
+                    state, input_array, len(values), output_array, len(output_array)
+                )
+                outputs.extend(output_array[: state.out_len])
+                if status != _OUTPUT_FULL:
+                    break
+                if len(output_array) < 1 << 16:
+                    output_array = (ctypes.c_int64 * (2 * len(output_array)))()
+        finally:
+            bf_release(state)
+        if status != _DONE:
+            raise _ERRORS[status]()
+        return outputs
+
+    run.source = source
+    return run
+
+
+def generate_c(code: list[Instruction], cells: CellMode = CellMode.UNBOUNDED) -> str:
+    """
+    Translates offset addressed instructions into the C source of
+    ``bf_run``, which runs them on the tape in a state struct.
+
+    Inputs and outputs are arrays of the caller. When the output array is
+    full, ``bf_run`` saves the pointer and which output it stopped at and
+    returns, the next call with the same state continues there.
+    """
+    emitter = _Emitter(code, cells.modulus)
+    lines = []
+    emitter.block(lines, 0, len(code), 1)
+    resume = "".join(
+        f"    case {index}: goto out_{index};\n"
+        for index in range(1, emitter.outputs + 1)
+    )
+    return _TEMPLATE.format(
+        cell=_CELL_TYPES[cells],
+        resume=resume,
+        body="\n".join(lines),
+        UNDERFLOW=_UNDERFLOW,
+        LEFT_OF_TAPE=_LEFT_OF_TAPE,
+        NO_INPUT=_NO_INPUT,
+        NO_MEMORY=_NO_MEMORY,
+    )
+
+
+_TEMPLATE = """\
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+
+typedef {cell} cell;
+
+typedef struct {{
+    cell *tape;
+    int64_t size;
+    int64_t p;
+    int64_t in_pos;
+    int64_t out_len;
+    int64_t resume;
+}} state;
+
+static int grow(state *s, int64_t needed) {{
+    int64_t size = s->size ? s->size : 64;
+    while (size <= needed) size *= 2;
+    cell *tape = realloc(s->tape, size * sizeof(cell));
+    if (!tape) return 0;
+    memset(tape + s->size, 0, (size - s->size) * sizeof(cell));
+    s->tape = tape;
+    s->size = size;
+    return 1;
+}}
+
+#define FAIL(code) do {{ status = code; goto done; }} while (0)
+#define RIGHT(n) do {{ \\
+    if ((n) >= s->size) {{ \\
+        if (!grow(s, n)) FAIL({NO_MEMORY}); \\
+        t = s->tape; \\
+    }} \\
+}} while (0)
+#define LEFT(n) do {{ if ((n) < 0) FAIL({LEFT_OF_TAPE}); }} while (0)
+#define CHECK(n) do {{ if (t[n] < 0) FAIL({UNDERFLOW}); }} while (0)
+#define READ(n) do {{ \\
+    if (s->in_pos == n_inputs) FAIL({NO_INPUT}); \\
+    t[n] = (cell)inputs[s->in_pos++]; \\
+}} while (0)
+
+int bf_run(state *s, const int64_t *inputs, int64_t n_inputs,
+           int64_t *outputs, int64_t capacity) {{
+    int status = 0;
+    if (!s->tape && !grow(s, 0)) return {NO_MEMORY};
+    cell *t = s->tape;
+    int64_t p = s->p;
+    switch (s->resume) {{
+{resume}    default: break;
+    }}
+{body}
+done:
+    s->p = p;
+    return status;
+}}
+
+void bf_release(state *s) {{
+    free(s->tape);
+    s->tape = NULL;
+}}
+"""
+
+
+class _Emitter:
+    def __init__(self, code: list[Instruction], modulus: int | None) -> None:
+        self._code = code
+        self._modulus = modulus
+        self.outputs = 0
+
+    def block(self, lines: list[str], start: int, end: int, indent: int) -> None:
+        pad = "    " * indent
+        index = start
+        checked = start
+        while index < end:
+            op, arg = self._code[index]
+            if op in _ADDRESSED and index >= checked:
+                checked = self._check_run(lines, pad, index, end)
+            if op == JZ:
+                lines.append(f"{pad}while (t[p]) {{")
+                self.block(lines, index + 1, arg - 1, indent + 1)
+                lines.append(f"{pad}}}")
+                index = arg
+                continue
+            if op == MOVE:
+                lines.append(f"{pad}p += {arg};")
+                lines.extend(_bounds(pad, arg, "p"))
+            elif op == ADD:
+                lines.extend(self._add(pad, "p", arg))
+            elif op == CLEAR:
+                lines.append(f"{pad}t[p] = 0;")
+            elif op == MULADD:
+                lines.extend(self._multiply_add(pad, 0, arg))
+            elif op == SCAN:
+                lines.append(f"{pad}while (t[p]) {{")
+                lines.append(f"{pad}    p += {arg};")
+                lines.extend(_bounds(pad + "    ", arg, "p"))
+                lines.append(f"{pad}}}")
+            elif op == IN:
+                lines.append(f"{pad}READ(p);")
+            elif op == OUT:
+                lines.extend(self._output(pad, "p"))
+            elif op == ADDAT:
+                lines.extend(self._add(pad, _at(arg[0]), arg[1]))
+            elif op == SETAT:
+                lines.append(f"{pad}t[{_at(arg[0])}] = {self._literal(arg[1])};")
+            elif op == INAT:
+                lines.append(f"{pad}READ({_at(arg)});")
+            elif op == OUTAT:
+                lines.extend(self._output(pad, _at(arg)))
+            elif op == MULADDAT:
+                lines.extend(self._multiply_add(pad, *arg))
+            index += 1
+
+    def _check_run(self, lines: list[str], pad: str, start: int, end: int) -> int:
+        """
+        Checks the bounds of all cells accessed by the offset addressed
+        instructions from ``start`` on at once and returns where they end.
+        A run ends after input or output, such that a bad access never
+        fails before those happened. Only the control cell of a
+        ``MULADDAT`` counts, its targets are checked when it adds.
+        """
+        lowest = highest = 0
+        index = start
+        while index < end and self._code[index][0] in _ADDRESSED:
+            op, arg = self._code[index]
+            offset = arg if op in (INAT, OUTAT) else arg[0]
+            lowest = min(lowest, offset)
+            highest = max(highest, offset)
+            index += 1
+            if op in (INAT, OUTAT):
+                break
+        lines.extend(_bounds(pad, lowest, _at(lowest)))
+        lines.extend(_bounds(pad, highest, _at(highest)))
+        return index
+
+    def _multiply_add(
+        self,
+        pad: str,
+        control: int,
+        pairs: tuple[tuple[int, int], ...],
+    ) -> list[str]:
+        lines = [f"{pad}if (t[{_at(control)}]) {{"]
+        inner = pad + "    "
+        lines.append(f"{inner}cell value = t[{_at(control)}];")
+        lowest, highest = control + pairs[0][0], control + pairs[-1][0]
+        lines.extend(_bounds(inner, lowest, _at(lowest)))
+        lines.extend(_bounds(inner, highest, _at(highest)))
+        for offset, factor in pairs:
+            cell = f"t[{_at(control + offset)}]"
+            if self._modulus is None:
+                lines.append(f"{inner}{cell} += {factor}LL * value;")
+                if factor < 0:
+                    lines.append(f"{inner}CHECK({_at(control + offset)});")
+            else:
+                factor %= self._modulus
+                lines.append(f"{inner}{cell} += (cell)({factor}ULL * value);")
+        lines.append(f"{inner}t[{_at(control)}] = 0;")
+        lines.append(f"{pad}}}")
+        return lines
+
+    def _output(self, pad: str, position: str) -> list[str]:
+        self.outputs += 1
+        label = self.outputs
+        return [
+            f"{pad}if (s->out_len == capacity) {{",
+            f"{pad}    s->resume = {label};",
+            f"{pad}    FAIL({_OUTPUT_FULL});",
+            f"{pad}}}",
+            f"out_{label}:",
+            f"{pad}outputs[s->out_len++] = t[{position}];",
+        ]
+
+    def _add(self, pad: str, position: str, amount: int) -> list[str]:
+        lines = [f"{pad}t[{position}] += {self._literal(amount)};"]
+        if self._modulus is None and amount < 0:
+            lines.append(f"{pad}CHECK({position});")
+        return lines
+
+    def _literal(self, value: int) -> str:
+        if self._modulus is None:
+            return f"{value}LL"
+        return f"(cell){value % self._modulus}ULL"
+
+
+def _at(offset: int) -> str:
+    if offset > 0:
+        return f"p + {offset}"
+    if offset < 0:
+        return f"p - {-offset}"
+    return "p"
+
+
+def _bounds(pad: str, offset: int, position: str) -> list[str]:
+    if offset < 0:
+        return [f"{pad}LEFT({position});"]
+    if offset > 0:
+        return [f"{pad}RIGHT({position});"]
+    return []
@@ -0,0 +1,197 @@
+import dataclasses
+from typing import Iterable, Union
+
+from .interpreter import StateMachine
+
+_INVERSE = {"+": "-", "-": "+", ">": "<", "<": ">"}
+
+Block = list[Union[str, "Block"]]
+
+
+@dataclasses.dataclass
+class PeepholeReport:
+    characters_before: int
+    characters_after: int
+    steps_before: int = 0
+    steps_after: int = 0
+
+    @property
+    def characters_saved(self) -> int:
+        return self.characters_before - self.characters_after
+
+    @property
+    def steps_saved(self) -> int:
+        return self.steps_before - self.steps_after
+
+
+def optimize(code: str, zero_tape: bool = True) -> str:
+    """
+    Removes redundant instructions from a program.
+
+    Adjacent inverse instructions like ``+-`` and ``><`` cancel. Loops whose
+    control cell is known to be zero on entry are dropped, which includes
+    clearing an already empty cell. Cells are known to be zero after a loop
+    over them exits and, with ``zero_tape``, everywhere at the start. Pass
+    ``zero_tape=False`` for fragments that run on a tape in unknown state.
+
+    Cancelling ``-+`` also removes the failure of decrementing a zero cell,
+    and cancelling ``<>`` the failure of moving left of the first cell, so
+    programs which rely on these assertions change behavior.
+    """
+    tree = _parse(code)
+    while True:
+        optimized = _Propagation(zero_tape).block(_cancel(tree))
+        if optimized == tree:
+            return _render(tree)
+        tree = optimized
+
+
+def report(code: str, input_batches: Iterable[list[int]] = ()) -> PeepholeReport:
+    """
+    Optimizes the program and measures the savings.
+
+    Executed steps are the characters ``StateMachine.step`` runs, summed
+    over running both versions on every input vector. The outputs have to
+    agree.
+    """
+    optimized = optimize(code)
+    result = PeepholeReport(len(code), len(optimized))
+    for inputs in input_batches:
+        outputs, steps = _execute(code, inputs)
+        optimized_outputs, optimized_steps = _execute(optimized, inputs)
+        assert outputs == optimized_outputs
+        result.steps_before += steps
+        result.steps_after += optimized_steps
+    return result
+
+
+def _execute(code: str, inputs: list[int]) -> tuple[list[int], int]:
+    machine = StateMachine(code, list(inputs))
+    while machine._program_counter != len(code):
+        machine.step()
+    return machine._outputs, machine.steps
+
+
+def _parse(code: str) -> Block:
+    stack = [[]]
+    for char in code:
+        if char in _INVERSE or char in ",.":
+            stack[-1].append(char)
+        elif char == "[":
+            stack.append([])
+        elif char == "]":
+            assert len(stack) > 1, "Unmatched ']'"
+            loop = stack.pop()
+            stack[-1].append(loop)
+    assert len(stack) == 1, "Unmatched '['"
+    return stack[0]
+
+
+def _render(block: Block) -> str:
+    return "".join(
+        item if isinstance(item, str) else "[" + _render(item) + "]" for item in block
+    )
+
+
+def _cancel(block: Block) -> Block:
+    result = []
+    for item in block:
+        if isinstance(item, list):
+            result.append(_cancel(item))
+        elif result and result[-1] == _INVERSE.get(item):
+            result.pop()
+        else:
+            result.append(item)
+    return result
+
+
+def _writes(block: Block) -> set[int] | None:
+    """
+    Returns the offsets of all cells a block may change relative to its
+    start, or ``None`` if the pointer does not return to the start.
+    """
+    offset = 0
+    written = set()
+    for item in block:
+        if item == ">":
+            offset += 1
+        elif item == "<":
+            offset -= 1
+        elif item in ("+", "-", ","):
+            written.add(offset)
+        elif isinstance(item, list):
+            inner = _writes(item)
+            if inner is None:
+                return None
+            written.update(offset + cell for cell in inner)
+            written.add(offset)
+    return written if offset == 0 else None
+
+
+class _Propagation:
+    def __init__(self, zero_tape: bool) -> None:
+        self._position = 0
+        self._values: dict[int, int | None] = {}
+        self._default = 0 if zero_tape else None
+
+    def block(self, block: Block) -> Block:
+        result = []
+        for item in block:
+            if isinstance(item, list):
+                if self._value() == 0:
+                    continue
+                result.append(self._loop(item))
+                continue
+            if item == ">":
+                self._move(1)
+            elif item == "<":
+                self._move(-1)
+            elif item == "+":
+                self._change(1)
+            elif item == "-":
+                self._change(-1)
+            elif item == ",":
+                self._set(None)
+            result.append(item)
+        return result
+
+    def _loop(self, loop: Block) -> Block:
+        written = _writes(loop)
+        if written is None or self._position is None:
+            self._forget_all()
+            return _Propagation(False).block(loop)
+        for offset in written:
+            self._values[self._position + offset] = None
+        self._set(None)
+        body = _Propagation(False)
+        body._position = self._position
+        body._values = dict(self._values)
+        body._default = self._default
+        optimized = body.block(loop)
+        self._set(0)
+        return optimized
+
+    def _value(self) -> int | None:
+        if self._position is None:
+            return None
+        return self._values.get(self._position, self._default)
+
+    def _set(self, value: int | None) -> None:
+        if self._position is not None:
+            self._values[self._position] = value
+
+    def _change(self, amount: int) -> None:
+        value = self._value()
+        if value is None or value + amount < 0:
+            self._set(None)
+        else:
+            self._set(value + amount)
+
+    def _move(self, amount: int) -> None:
+        if self._position is not None:
+            self._position += amount
+
+    def _forget_all(self) -> None:
+        self._position = None
+        self._values = {}
+        self._default = None
@@ -0,0 +1,85 @@
+import dataclasses
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, Sequence
+
+from .compiler import Instruction, compile_program
+from .interpreter import BudgetExceeded, StateMachine
+
+OK = "ok"
+BUDGET_EXCEEDED = "budget-exceeded"
+RUNTIME_ERROR = "runtime-error"
+
+
+@dataclasses.dataclass
+class JobResult:
+    index: int
+    status: str
+    outputs: list[int]
+    steps: int = 0
+    error: str | None = None
+
+
+def run_many(
+    program: str,
+    input_batches: Sequence[Sequence[int]],
+    workers: int | None = None,
+    max_steps: int | None = None,
+    timeout: float | None = None,
+) -> Iterator[JobResult]:
+    """
+    Runs a program for every input vector on a pool of worker processes.
+
+    Results are yielded in order of completion. Each carries the index of
+    its input vector. A job that runs out of steps or time is stopped and
+    reported as ``BUDGET_EXCEEDED``, a job that fails a tape assertion or
+    runs out of input as ``RUNTIME_ERROR``.
+
+    Jobs that have not started yet are cancelled when the iterator is
+    closed early.
+    """
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(program,)
+    ) as executor:
+        futures = {
+            executor.submit(_run_job, index, list(inputs), max_steps, timeout): index
+            for index, inputs in enumerate(input_batches)
+        }
+        try:
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except Exception as error:
+                    yield JobResult(
+                        futures[future], RUNTIME_ERROR, [], error=repr(error)
+                    )
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+
+_program: str = ""
+_code: list[Instruction] = []
+
+
+def _init_worker(program: str) -> None:
+    global _program, _code
+    _program = program
+    _code = compile_program(program, offsets=True)
+
+
+def _run_job(
+    index: int, inputs: list[int], max_steps: int | None, timeout: float | None
+) -> JobResult:
+    machine = StateMachine(
+        _program, inputs, max_steps=max_steps, timeout=timeout, code=_code
+    )
+    try:
+        outputs = machine.run()
+    except BudgetExceeded as error:
+        return JobResult(
+            index, BUDGET_EXCEEDED, machine._outputs, machine.steps, str(error)
+        )
+    except (AssertionError, IndexError) as error:
+        return JobResult(
+            index, RUNTIME_ERROR, machine._outputs, machine.steps, repr(error)
+        )
+    return JobResult(index, OK, outputs, machine.steps)
@@ -0,0 +1,230 @@
+import collections
+import dataclasses
+from typing import BinaryIO, Iterable
+
+from .compiler import (
+    ADD,
+    CLEAR,
+    IN,
+    JNZ,
+    JZ,
+    MOVE,
+    MULADD,
+    OUT,
+    SCAN,
+    Instruction,
+    compile_with_positions,
+)
+from .interpreter import RightInfiniteTape, input_reader
+from .tape import ArrayTape
+
+
+@dataclasses.dataclass
+class LoopStats:
+    position: int
+    entries: int
+    iterations: int
+    steps: int
+    source: str
+
+
+class Profile:
+    """
+    Execution counts of one run.
+
+    Counts are kept per compiled instruction and reported per position in
+    the source. Loops are identified by the position of their opening
+    bracket, this includes loops which were compiled into a single idiom
+    instruction. ``steps`` of a loop include everything nested in it.
+    """
+
+    def __init__(
+        self, program: str, code: list[Instruction], positions: list[int]
+    ) -> None:
+        self.program = program
+        self.code = code
+        self.positions = positions
+        self.counts = [0] * len(code)
+        self.entries = [0] * len(code)
+        self.iterations = [0] * len(code)
+        self.max_extent = 1
+        self.growths = 0
+
+        self._enclosing: list[tuple[int, ...]] = []
+        self._ends: dict[int, int] = {}
+        stack: list[int] = []
+        for index, (op, arg) in enumerate(code):
+            if op == JNZ:
+                stack.pop()
+            self._enclosing.append(tuple(stack))
+            if op == JZ:
+                stack.append(index)
+                self._ends[index] = arg - 1
+            elif op in (CLEAR, MULADD, SCAN):
+                self._ends[index] = index
+
+    @property
+    def steps(self) -> int:
+        return sum(self.counts)
+
+    def position_counts(self) -> dict[int, int]:
+        counts = collections.Counter()
+        for index, count in enumerate(self.counts):
+            if count:
+                counts[self.positions[index]] += count
+        return dict(counts)
+
+    def hot_loops(self) -> list[LoopStats]:
+        loops = []
+        for start, end in self._ends.items():
+            if not self.entries[start]:
+                continue
+            source_end = self._source_end(end)
+            loops.append(
+                LoopStats(
+                    position=self.positions[start],
+                    entries=self.entries[start],
+                    iterations=self.iterations[start],
+                    steps=sum(self.counts[start : end + 1]),
+                    source=self.program[self.positions[start] : source_end],
+                )
+            )
+        loops.sort(key=lambda loop: loop.steps, reverse=True)
+        return loops
+
+    def report(self, limit: int = 10) -> str:
+        lines = [
+            f"{self.steps} steps, tape extent {self.max_extent}, "
+            f"{self.growths} tape growths",
+            f"{'position':>8} {'steps':>10} {'entries':>8} {'iterations':>10}  loop",
+        ]
+        for loop in self.hot_loops()[:limit]:
+            source = loop.source if len(loop.source) <= 40 else loop.source[:37] + "..."
+            lines.append(
+                f"{loop.position:8} {loop.steps:10} {loop.entries:8} "
+                f"{loop.iterations:10}  {source}"
+            )
+        return "\n".join(lines)
+
+    def folded_stacks(self) -> str:
+        """
+        Returns the steps in the folded stack format understood by
+        flamegraph.pl and speedscope, one line per loop nesting path.
+        """
+        totals = collections.Counter()
+        for index, count in enumerate(self.counts):
+            if not count:
+                continue
+            frames = ["program"]
+            frames.extend(f"loop@{self.positions[i]}" for i in self._enclosing[index])
+            if self.code[index][0] in (CLEAR, MULADD, SCAN):
+                frames.append(f"loop@{self.positions[index]}")
+            totals[";".join(frames)] += count
+        return "\n".join(f"{stack} {count}" for stack, count in sorted(totals.items()))
+
+    def _source_end(self, end: int) -> int:
+        op = self.code[end][0]
+        if op == JNZ:
+            return self.positions[end] + 1
+        return self.program.index("]", self.positions[end]) + 1
+
+
+def profile(
+    program: str,
+    inputs: Iterable[int] | BinaryIO,
+    tape: RightInfiniteTape | ArrayTape | None = None,
+) -> tuple[list[int], Profile]:
+    """
+    Runs a program like ``StateMachine.run`` while counting executions.
+
+    This is a separate interpreter loop, the regular one carries no
+    profiling overhead.
+    """
+    code, positions = compile_with_positions(program)
+    result = Profile(program, code, positions)
+    counts = result.counts
+    entries = result.entries
+    iterations = result.iterations
+    tape = RightInfiniteTape() if tape is None else tape
+    cells = tape._tape
+    modulus = tape.mode.modulus
+    read = input_reader(inputs)
+    outputs = []
+    pointer = tape._cursor
+    program_counter = 0
+    end = len(code)
+
+    def grow(needed: int) -> None:
+        cells.extend([0] * max(needed + 1 - len(cells), len(cells)))
+        result.growths += 1
+
+    try:
+        while program_counter < end:
+            index = program_counter
+            op, arg = code[index]
+            counts[index] += 1
+            program_counter += 1
+            if op == MOVE:
+                pointer += arg
+                assert pointer >= 0, str(tape)
+                if pointer >= len(cells):
+                    grow(pointer)
+                result.max_extent = max(result.max_extent, pointer + 1)
+            elif op == ADD:
+                value = cells[pointer] + arg
+                if modulus:
+                    value %= modulus
+                else:
+                    assert value >= 0, str(tape)
+                cells[pointer] = value
+            elif op == JZ:
+                if cells[pointer]:
+                    entries[index] += 1
+                    iterations[index] += 1
+                else:
+                    program_counter = arg
+            elif op == JNZ:
+                if cells[pointer]:
+                    program_counter = arg
+                    iterations[arg - 1] += 1
+            elif op == CLEAR:
+                if cells[pointer]:
+                    entries[index] += 1
+                    iterations[index] += cells[pointer]
+                cells[pointer] = 0
+            elif op == MULADD:
+                value = cells[pointer]
+                if value:
+                    entries[index] += 1
+                    iterations[index] += value
+                    for offset, factor in arg:
+                        target = pointer + offset
+                        assert target >= 0, str(tape)
+                        if target >= len(cells):
+                            grow(target)
+                        result.max_extent = max(result.max_extent, target + 1)
+                        total = cells[target] + factor * value
+                        if modulus:
+                            total %= modulus
+                        else:
+                            assert total >= 0, str(tape)
+                        cells[target] = total
+                    cells[pointer] = 0
+            elif op == SCAN:
+                if cells[pointer]:
+                    entries[index] += 1
+                while cells[pointer]:
+                    iterations[index] += 1
+                    pointer += arg
+                    assert pointer >= 0, str(tape)
+                    if pointer >= len(cells):
+                        grow(pointer)
+                    result.max_extent = max(result.max_extent, pointer + 1)
+            elif op == IN:
+                value = read()
+                cells[pointer] = value % modulus if modulus else value
+            elif op == OUT:
+                outputs.append(cells[pointer])
+    finally:
+        tape._park(max(pointer, 0))
+    return outputs, result
@@ -0,0 +1,61 @@
+import collections
+import dataclasses
+
+from .profiler import Profile
+
+
+@dataclasses.dataclass(frozen=True)
+class SourceMapEntry:
+    start: int
+    end: int
+    helper: str
+    operands: tuple[int, ...]
+    path: tuple[str, ...]
+
+
+class SourceMap:
+    """
+    Maps positions in a generated program back to the helper calls that
+    emitted them.
+
+    Positions count from the start of the first fragment generated on the
+    tape, so they match the program when the fragments are concatenated
+    in the order they were generated.
+    """
+
+    def __init__(self, entries: list[SourceMapEntry]) -> None:
+        self.entries = sorted(entries, key=lambda entry: (entry.start, -entry.end))
+        length = max((entry.end for entry in entries), default=0)
+        self._owner: list[SourceMapEntry | None] = [None] * length
+        for entry in self.entries:
+            for position in range(entry.start, entry.end):
+                self._owner[position] = entry
+
+    def innermost(self, position: int) -> SourceMapEntry | None:
+        if 0 <= position < len(self._owner):
+            return self._owner[position]
+        return None
+
+    def steps_per_operation(self, profile: Profile) -> dict[str, int]:
+        """
+        Sums up the steps of a profile per innermost helper call path, for
+        example ``op_while > fn_divide > fn_greater_equals > fn_and``.
+        """
+        totals = collections.Counter()
+        for position, count in profile.position_counts().items():
+            entry = self.innermost(position)
+            path = " > ".join(entry.path) if entry else "<unmapped>"
+            totals[path] += count
+        return dict(totals.most_common())
+
+    def steps_per_helper(self, profile: Profile) -> dict[str, int]:
+        """
+        Sums up the steps of a profile per helper, counting each step for
+        every distinct helper on its path.
+        """
+        totals = collections.Counter()
+        for position, count in profile.position_counts().items():
+            entry = self.innermost(position)
+            for helper in set(entry.path) if entry else ["<unmapped>"]:
+                totals[helper] += count
+        return dict(totals.most_common())
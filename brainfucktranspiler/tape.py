@@ -0,0 +1,190 @@
+import array
+import enum
+import sys
+
+
+class CellMode(enum.Enum):
+    UNBOUNDED = (None, None)
+    WRAP8 = ("B", 1 << 8)
+    WRAP16 = ("H", 1 << 16)
+    WRAP32 = ("I", 1 << 32)
+
+    def __init__(self, typecode: str | None, modulus: int | None) -> None:
+        self.typecode = typecode
+        self.modulus = modulus
+
+    def allocate(self, size: int) -> list[int] | bytearray | array.array:
+        """
+        Returns ``size`` zero cells. Unbounded cells are a list of Python
+        integers, the wrapping modes use a buffer of the cell width.
+        """
+        if self is CellMode.UNBOUNDED:
+            return [0] * size
+        if self is CellMode.WRAP8:
+            return bytearray(size)
+        return array.array(self.typecode, bytes(size * self.itemsize))
+
+    @property
+    def itemsize(self) -> int:
+        assert self.typecode is not None, "Unbounded cells have no fixed size"
+        return array.array(self.typecode).itemsize
+
+
+class ArrayTape:
+    """
+    Tape stored in a flat buffer from ``CellMode.allocate``.
+
+    The buffer doubles whenever the cursor moves past its end and never
+    shrinks. With ``CellMode.UNBOUNDED`` the cells are Python integers and
+    decrementing a zero cell fails like in ``RightInfiniteTape``, the
+    wrapping modes compute modulo the cell width instead.
+    """
+
+    def __init__(self, mode: CellMode = CellMode.UNBOUNDED, size: int = 64) -> None:
+        self.mode = mode
+        self._tape = mode.allocate(size)
+        self._cursor = 0
+
+    def right(self) -> None:
+        self._cursor += 1
+        if self._cursor == len(self._tape):
+            self._tape.extend(self.mode.allocate(len(self._tape)))
+
+    def left(self) -> None:
+        assert self._cursor > 0, str(self)
+        self._cursor -= 1
+
+    def increment(self) -> None:
+        self.set(self.get() + 1)
+
+    def decrement(self) -> None:
+        if self.mode.modulus is None:
+            assert not self.is_zero(), str(self)
+        self.set(self.get() - 1)
+
+    def is_zero(self) -> int:
+        return self.get() == 0
+
+    def get(self) -> int:
+        return self._tape[self._cursor]
+
+    def set(self, number: int) -> None:
+        if self.mode.modulus is not None:
+            number %= self.mode.modulus
+        self._tape[self._cursor] = number
+
+    def extent(self) -> int:
+        end = len(self._tape)
+        while end > self._cursor + 1 and self._tape[end - 1] == 0:
+            end -= 1
+        return end
+
+    def _park(self, cursor: int) -> None:
+        self._cursor = cursor
+
+    def __str__(self) -> str:
+        return " ".join(
+            f"[{cell}]" if idx == self._cursor else f"{cell}"
+            for idx, cell in enumerate(self._tape[: self.extent()])
+        )
+
+
+class PagedTape:
+    """
+    Tape that allocates fixed size pages on the first write to them.
+
+    Memory depends on the pages written to, not on how far the cursor
+    travels, and reading untouched cells yields zero. ``str`` only shows
+    ``window`` cells on either side of the cursor.
+
+    The fast engines index ``_tape`` directly, which reports an unlimited
+    length so that they never try to grow it.
+    """
+
+    def __init__(
+        self,
+        mode: CellMode = CellMode.UNBOUNDED,
+        page_size: int = 4096,
+        window: int = 8,
+    ) -> None:
+        assert page_size & (page_size - 1) == 0, "Page size has to be a power of 2"
+        self.mode = mode
+        self.window = window
+        self._tape = _Pages(mode, page_size)
+        self._cursor = 0
+
+    def right(self) -> None:
+        self._cursor += 1
+
+    def left(self) -> None:
+        assert self._cursor > 0, str(self)
+        self._cursor -= 1
+
+    def increment(self) -> None:
+        self.set(self.get() + 1)
+
+    def decrement(self) -> None:
+        if self.mode.modulus is None:
+            assert not self.is_zero(), str(self)
+        self.set(self.get() - 1)
+
+    def is_zero(self) -> int:
+        return self.get() == 0
+
+    def get(self) -> int:
+        return self._tape[self._cursor]
+
+    def set(self, number: int) -> None:
+        if self.mode.modulus is not None:
+            number %= self.mode.modulus
+        self._tape[self._cursor] = number
+
+    def pages(self) -> int:
+        return len(self._tape._pages)
+
+    def _park(self, cursor: int) -> None:
+        self._cursor = cursor
+
+    def __str__(self) -> str:
+        start = max(self._cursor - self.window, 0)
+        end = self._cursor + self.window + 1
+        cells = [
+            f"[{self._tape[idx]}]" if idx == self._cursor else f"{self._tape[idx]}"
+            for idx in range(start, end)
+        ]
+        prefix = ["..."] if start else []
+        return " ".join(prefix + cells + ["..."])
+
+
+class _Pages:
+    def __init__(self, mode: CellMode, page_size: int) -> None:
+        self._mode = mode
+        self._size = page_size
+        self._shift = page_size.bit_length() - 1
+        self._mask = page_size - 1
+        self._pages: dict[int, list[int] | bytearray | array.array] = {}
+        self._number: int | None = None
+        self._page = mode.allocate(0)
+
+    def __len__(self) -> int:
+        return sys.maxsize
+
+    def __getitem__(self, index: int) -> int:
+        number = index >> self._shift
+        if number != self._number:
+            page = self._pages.get(number)
+            if page is None:
+                return 0
+            self._number, self._page = number, page
+        return self._page[index & self._mask]
+
+    def __setitem__(self, index: int, value: int) -> None:
+        number = index >> self._shift
+        if number != self._number:
+            page = self._pages.get(number)
+            if page is None:
+                if not value:
+                    return
+                page = self._pages[number] = self._mode.allocate(self._size)
+            self._number, self._page = number, page
+        self._page[index & self._mask] = value
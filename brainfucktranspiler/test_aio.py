@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from .aio import AsyncMachine
+from .interpreter import BudgetExceeded, StateMachine
+from .tape import ArrayTape, CellMode
+
+REVERSE = ">,[>,]<[.<]"
+UPPER = ",[--------------------------------.,]"
+
+
+def test_gradual_input() -> None:
+    async def main() -> list[int]:
+        source, sink = asyncio.Queue(), asyncio.Queue()
+        machine = AsyncMachine(UPPER, source, sink)
+        task = asyncio.create_task(machine.run())
+        received = []
+        for char in b"abc":
+            await asyncio.sleep(0.01)
+            assert not task.done()
+            await source.put(char)
+            received.append(await sink.get())
+        await source.put(0)
+        await task
+        return received
+
+    assert bytes(asyncio.run(main())) == b"ABC"
+
+
+def test_end_of_input() -> None:
+    async def main() -> None:
+        source, sink = asyncio.Queue(), asyncio.Queue()
+        for value in [1, 2, None]:
+            source.put_nowait(value)
+        await AsyncMachine(REVERSE, source, sink).run()
+
+    with pytest.raises(IndexError):
+        asyncio.run(main())
+
+
+def test_time_slicing() -> None:
+    busy = "++++++++[>++++++++[>++++++++[>++++++++[-]<-]<-]<-]+."
+    finished = []
+
+    async def program(name: str, code: str) -> None:
+        source, sink = asyncio.Queue(), asyncio.Queue()
+        await AsyncMachine(code, source, sink, slice_steps=100).run()
+        finished.append((name, sink.get_nowait()))
+
+    async def main() -> None:
+        await asyncio.gather(program("busy", busy), program("quick", "+++."))
+
+    asyncio.run(main())
+    assert finished == [("quick", 3), ("busy", 1)]
+
+
+def test_matches_interpreter() -> None:
+    program = ",>,<[->[->+>+<<]>>[-<<+>>]<<<]>>>."
+
+    async def main() -> tuple[list[int], int]:
+        source, sink = asyncio.Queue(), asyncio.Queue()
+        for value in [200, 3]:
+            source.put_nowait(value)
+        tape = ArrayTape(CellMode.WRAP8)
+        machine = AsyncMachine(program, source, sink, tape=tape, slice_steps=7)
+        await machine.run()
+        return [sink.get_nowait() for _ in range(sink.qsize())], machine.steps
+
+    tape = ArrayTape(CellMode.WRAP8)
+    expected = StateMachine(program, [200, 3], tape=tape)
+    assert asyncio.run(main()) == (expected.run(), expected.steps)
+
+
+def test_budget() -> None:
+    async def main() -> None:
+        source, sink = asyncio.Queue(), asyncio.Queue()
+        await AsyncMachine("+[]", source, sink, max_steps=1000).run()
+
+    with pytest.raises(BudgetExceeded):
+        asyncio.run(main())
@@ -0,0 +1,57 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from .batch import run_batch
+from .codegen import TapeStack, fn_divide, op_input, op_output
+from .interpreter import StateMachine
+from .tape import ArrayTape, CellMode
+
+
+def divide_program() -> str:
+    tape = TapeStack()
+    quotient = tape.register_variable()
+    remainder = tape.register_variable()
+    dividend = tape.register_variable()
+    divisor = tape.register_variable()
+    return (
+        op_input(tape, dividend)
+        + op_input(tape, divisor)
+        + fn_divide(tape, quotient, remainder, dividend, divisor)
+        + op_output(tape, quotient)
+        + op_output(tape, remainder)
+    )
+
+
+def test_batch_matches_state_machine() -> None:
+    program = divide_program()
+    batches = [[dividend, divisor] for dividend in range(12) for divisor in (1, 3, 5)]
+    expected = [StateMachine(program, inputs).run() for inputs in batches]
+    assert run_batch(program, batches) == expected
+
+
+def test_batch_divergent_scan() -> None:
+    program = ">,[>,]<[.<]"
+    batches = [[1, 2, 0], [0], [5, 0], [1, 1, 1, 1, 1, 1, 1, 1, 0]]
+    expected = [StateMachine(program, inputs).run() for inputs in batches]
+    assert run_batch(program, batches) == expected
+
+
+def test_batch_grows_tape() -> None:
+    assert run_batch(">" * 100 + ",.", [[1], [2]]) == [[1], [2]]
+
+
+def test_batch_wrapping() -> None:
+    program = ",-[->+<]>."
+    mode = CellMode.WRAP8
+    expected = StateMachine(program, [0], tape=ArrayTape(mode)).run()
+    assert run_batch(program, [[0], [3]], mode) == [expected, [2]]
+
+
+def test_batch_assertions() -> None:
+    with pytest.raises(AssertionError):
+        run_batch(",-", [[1], [0]])
+    with pytest.raises(AssertionError):
+        run_batch(",[<]", [[0], [1]])
+    with pytest.raises(IndexError):
+        run_batch(",,", [[1, 2], [1]])
@@ -1,5 +1,11 @@
+import pytest
+
 from .codegen import (
+    _op_branch,
+    op_accumulate,
+    op_clear,
     TapeStack,
+    compile_generated,
     fn_plus,
     fn_copy,
     op_input,
@@ -11,10 +17,22 @@ from .codegen import (
     fn_and,
     op_subtract_smaller,
     fn_less_equals,
+    fn_add_constant,
     fn_divide,
+    fn_divide_fast,
+    fn_multiply_fast,
     fn_or,
+    op_decrement,
+    op_if,
+    op_increment,
+    op_set_constant,
+    op_while,
 )
+from .benchmark.workloads import euler_1
+from .compiler import compile_program
 from .interpreter import StateMachine
+from .peephole import optimize
+from .tape import ArrayTape, CellMode
 
 
 def test_copy() -> None:
@@ -221,3 +239,340 @@ def test_divide() -> None:
     assert StateMachine(code, [1, 2]).run() == [0, 1]
     assert StateMachine(code, [10, 3]).run() == [3, 1]
     assert StateMachine(code, [10, 5]).run() == [2, 0]
+
+
+def test_build() -> None:
+    tape = TapeStack()
+    source = tape.register_variable()
+    destination = tape.register_variable()
+    code = tape.build(
+        lambda: op_input(tape, source)
+        + fn_copy(tape, destination, source)
+        + op_output(tape, destination)
+    )
+    assert tape._code == []
+    assert tape.build(lambda: op_input(tape, destination)) == ","
+    assert StateMachine(code, [2]).run() == [2]
+
+
+def test_while_with_literal_body() -> None:
+    tape = TapeStack()
+    counter = tape.register_variable()
+    result = tape.register_variable()
+
+    def body() -> None:
+        op_decrement(tape, counter)
+        tape.emit(">+<")
+
+    code = op_input(tape, counter) + op_while(tape, counter, body)
+    assert code == ",[->+<]"
+    code = op_while(
+        tape, counter, lambda: tape.seek(result) + "+" + tape.seek(counter) + "-"
+    )
+    assert code == "[>+<-]"
+
+
+def test_returned_code_next_to_helpers_is_rejected() -> None:
+    tape = TapeStack()
+    counter = tape.register_variable()
+    result = tape.register_variable()
+    with pytest.raises(ValueError):
+        op_while(
+            tape,
+            counter,
+            lambda: tape.seek(result) + "+" + op_decrement(tape, counter),
+        )
+
+
+def test_if_bodies() -> None:
+    tape = TapeStack()
+    condition = tape.register_variable()
+    result = tape.register_variable()
+
+    def emitting() -> None:
+        tape.emit(tape.seek(result) + "+")
+
+    bodies = [
+        lambda: op_increment(tape, result),
+        lambda: tape.seek(result) + "+",
+        emitting,
+    ]
+    for body in bodies:
+        assert op_if(tape, condition, body) == "[>+<[-]]"
+    code = op_input(tape, condition) + op_if(tape, condition, bodies[1])
+    code += op_output(tape, result)
+    assert StateMachine(code, [3]).run() == [1]
+    assert StateMachine(code, [0]).run() == [0]
+    with pytest.raises(ValueError):
+        op_if(
+            tape,
+            condition,
+            lambda: tape.seek(result) + "+" + op_decrement(tape, condition),
+        )
+
+
+def count_steps(code: str, inputs: list[int]) -> tuple[list[int], int]:
+    machine = StateMachine(code, inputs)
+    while machine._program_counter != len(code):
+        machine.step()
+    return machine._outputs, machine.steps
+
+
+def test_multiply_fast() -> None:
+    codes = []
+    for multiply in (fn_multiply, fn_multiply_fast):
+        tape = TapeStack()
+        result = tape.register_variable()
+        left = tape.register_variable()
+        right = tape.register_variable()
+        codes.append(
+            op_input(tape, left)
+            + op_input(tape, right)
+            + multiply(tape, result, left, right)
+            + op_output(tape, result)
+        )
+    for left, right in [(0, 3), (3, 0), (1, 1), (2, 3), (7, 5), (30, 7)]:
+        slow, fast = (count_steps(code, [left, right]) for code in codes)
+        assert fast[0] == slow[0] == [left * right]
+    assert fast[1] < slow[1] * 2 / 3
+    assert optimize(codes[1]) != codes[1]
+    assert StateMachine(optimize(codes[1]), [6, 7]).run() == [42]
+
+
+def test_multiply_fast_adds() -> None:
+    for multiply in (fn_multiply, fn_multiply_fast):
+        tape = TapeStack()
+        result = tape.register_variable()
+        left = tape.register_variable()
+        right = tape.register_variable()
+        code = (
+            op_input(tape, result)
+            + op_input(tape, left)
+            + op_input(tape, right)
+            + multiply(tape, result, left, right)
+            + op_output(tape, result)
+            + multiply(tape, left, left, right)
+            + op_output(tape, left)
+        )
+        assert StateMachine(code, [3, 4, 5]).run() == [23, 24]
+
+
+def test_divide_fast() -> None:
+    codes = []
+    for divide in (fn_divide, fn_divide_fast):
+        tape = TapeStack()
+        quotient = tape.register_variable()
+        remainder = tape.register_variable()
+        dividend = tape.register_variable()
+        divisor = tape.register_variable()
+        codes.append(
+            op_input(tape, dividend)
+            + op_input(tape, divisor)
+            + divide(tape, quotient, remainder, dividend, divisor)
+            + op_output(tape, quotient)
+            + op_output(tape, remainder)
+        )
+    for dividend, divisor in [(0, 1), (1, 1), (2, 1), (1, 2), (10, 3), (10, 5)]:
+        expected = [dividend // divisor, dividend % divisor]
+        assert StateMachine(codes[1], [dividend, divisor]).run() == expected
+    slow, fast = (count_steps(code, [100, 3]) for code in codes)
+    assert fast[0] == slow[0] == [33, 1]
+    assert fast[1] * 10 < slow[1]
+
+
+def test_fragment_cache() -> None:
+    def program(tape: TapeStack) -> str:
+        quotient = tape.register_variable()
+        remainder = tape.register_variable()
+        dividend = tape.register_variable()
+        divisor = tape.register_variable()
+        return tape.build(
+            lambda: op_input(tape, dividend)
+            + op_input(tape, divisor)
+            + fn_divide(tape, quotient, remainder, dividend, divisor)
+            + fn_divide(tape, quotient, remainder, dividend, divisor)
+            + op_output(tape, quotient)
+        )
+
+    cached = TapeStack()
+    assert program(cached) == program(TapeStack(cache_size=0))
+    assert cached.fragments.hits > 0
+
+    small = TapeStack(cache_size=2)
+    assert program(small) == program(TapeStack(cache_size=0))
+    assert len(small.fragments._entries) == 2
+
+
+def test_compile_generated() -> None:
+    def program(tape: TapeStack) -> str:
+        quotient = tape.register_variable()
+        remainder = tape.register_variable()
+        dividend = tape.register_variable()
+        divisor = tape.register_variable()
+        return (
+            op_input(tape, dividend)
+            + op_input(tape, divisor)
+            + fn_divide(tape, quotient, remainder, dividend, divisor)
+            + fn_divide_fast(tape, quotient, remainder, dividend, divisor)
+            + op_output(tape, quotient)
+        )
+
+    chunks = []
+    assert program(TapeStack(sink=chunks.append)) == ""
+    assert len(chunks) > 1
+    assert "".join(chunks) == program(TapeStack())
+
+    code = compile_generated(program)
+    assert code == compile_program(program(TapeStack()))
+    assert StateMachine(None, [17, 5], code=code).run() == [3]
+    stepped = StateMachine(None, [17, 5], code=code)
+    for _ in range(10):
+        stepped.step()
+    assert stepped.run() == [3]
+
+
+def test_constants_fold_literals() -> None:
+    tape = TapeStack(constants=True)
+    source = tape.register_variable()
+    copy = tape.register_variable()
+    flag = tape.register_variable()
+
+    def never() -> str:
+        raise AssertionError("Generated a branch that cannot run")
+
+    code = tape.build(
+        lambda: "".join(op_increment(tape, source) for _ in range(3))
+        + fn_copy(tape, copy, source)
+        + op_if(tape, flag, never)
+        + op_output(tape, copy)
+    )
+    assert code == ">+++."
+
+
+def test_constants_keep_behavior() -> None:
+    def program(tape: TapeStack) -> str:
+        left = tape.register_variable()
+        right = tape.register_variable()
+        result = tape.register_variable()
+        quotient = tape.register_variable()
+        remainder = tape.register_variable()
+
+        def body() -> None:
+            for _ in range(7):
+                op_increment(tape, left)
+            for _ in range(6):
+                op_increment(tape, right)
+            fn_multiply(tape, result, left, right)
+            op_output(tape, result)
+            fn_divide(tape, quotient, remainder, result, right)
+            op_output(tape, quotient)
+            op_input(tape, left)
+            fn_divide(tape, quotient, remainder, left, right)
+            op_output(tape, quotient)
+            op_output(tape, remainder)
+            fn_multiply_fast(tape, result, left, right)
+            op_output(tape, result)
+            fn_divide_fast(tape, quotient, remainder, right, left)
+            op_output(tape, remainder)
+            op_while(
+                tape,
+                left,
+                lambda: op_decrement(tape, left) + fn_or(tape, result, left, remainder),
+            )
+            op_output(tape, result)
+
+        return tape.build(body)
+
+    plain = program(TapeStack())
+    folded = program(TapeStack(constants=True))
+    assert len(folded) < len(plain)
+    for value in (1, 5, 20):
+        expected = count_steps(plain, [value])
+        outputs, steps = count_steps(folded, [value])
+        assert outputs == expected[0]
+        assert steps < expected[1]
+
+
+def test_constants_euler_1() -> None:
+    plain = euler_1(TapeStack())
+    folded = euler_1(TapeStack(constants=True))
+    for ceiling in (1, 10, 16):
+        assert (
+            StateMachine(folded, [3, 5, ceiling]).run()
+            == StateMachine(plain, [3, 5, ceiling]).run()
+        )
+
+
+def test_set_constant() -> None:
+    for value in (0, 1, 17, 100, 1000):
+        tape = TapeStack()
+        var = tape.register_variable()
+        code = tape.build(lambda: op_set_constant(tape, var, value))
+        assert len(code) <= 3 + value
+        assert StateMachine(code + ".", []).run() == [value]
+    tape = TapeStack()
+    var = tape.register_variable()
+    code = tape.build(lambda: op_set_constant(tape, var, 100))
+    assert code == "[-]>[-]++++++++++[-<++++++++++>]<"
+
+
+def test_set_constant_wrapping() -> None:
+    tape = TapeStack(cells=CellMode.WRAP8)
+    var = tape.register_variable()
+    code = tape.build(
+        lambda: op_input(tape, var)
+        + op_set_constant(tape, var, 255)
+        + op_output(tape, var)
+        + op_set_constant(tape, var, -56)
+        + op_output(tape, var)
+    )
+    assert code.startswith(",[-]-.")
+    machine = StateMachine(code, [7], tape=ArrayTape(CellMode.WRAP8))
+    assert machine.run() == [255, 200]
+
+
+def test_set_constant_from_known_value() -> None:
+    tape = TapeStack(constants=True)
+    var = tape.register_variable()
+    code = tape.build(
+        lambda: op_set_constant(tape, var, 100)
+        + op_output(tape, var)
+        + op_set_constant(tape, var, 98)
+        + op_output(tape, var)
+    )
+    assert code.endswith(".--.")
+    assert StateMachine(code, []).run() == [100, 98]
+
+
+def test_add_constant() -> None:
+    tape = TapeStack()
+    operand = tape.register_variable()
+    result = tape.register_variable()
+    code = tape.build(
+        lambda: op_input(tape, operand)
+        + fn_add_constant(tape, result, operand, -40)
+        + fn_add_constant(tape, operand, operand, 50)
+        + op_output(tape, result)
+        + op_output(tape, operand)
+    )
+    assert StateMachine(code, [45]).run() == [5, 95]
+
+
+def test_constants_branches_do_not_leak() -> None:
+    tape = TapeStack(constants=True)
+    x = tape.register_variable()
+    y = tape.register_variable()
+    c = tape.register_variable()
+    code = tape.build(
+        lambda: op_input(tape, x)
+        + op_input(tape, c)
+        + _op_branch(
+            tape,
+            c,
+            lambda: op_clear(tape, x),
+            lambda: op_accumulate(tape, y, x),
+        )
+        + op_output(tape, y)
+    )
+    assert StateMachine(code, [5, 0]).run() == [5]
+    assert StateMachine(code, [5, 1]).run() == [0]
@@ -0,0 +1,196 @@
+import pytest
+
+from .compiler import (
+    ADD,
+    ADDAT,
+    CLEAR,
+    IN,
+    INAT,
+    JNZ,
+    JZ,
+    MOVE,
+    MULADD,
+    OUT,
+    OUTAT,
+    SCAN,
+    SETAT,
+    Compiler,
+    compile_program,
+    to_source,
+)
+from .interpreter import StateMachine
+from .tape import ArrayTape, CellMode, PagedTape
+
+
+def test_fold_runs() -> None:
+    assert compile_program("+++>>--<,.") == [
+        (ADD, 3),
+        (MOVE, 2),
+        (ADD, -2),
+        (MOVE, -1),
+        (IN, 0),
+        (OUT, 0),
+    ]
+
+
+def test_no_folding_across_inverse() -> None:
+    assert compile_program("+-") == [(ADD, 1), (ADD, -1)]
+
+
+def test_comments_are_skipped() -> None:
+    assert compile_program("+ add + one") == [(ADD, 2)]
+
+
+def test_jump_targets() -> None:
+    assert compile_program(">[-]<", idioms=False) == [
+        (MOVE, 1),
+        (JZ, 4),
+        (ADD, -1),
+        (JNZ, 2),
+        (MOVE, -1),
+    ]
+
+
+def test_unbalanced() -> None:
+    with pytest.raises(ValueError, match="position 3"):
+        compile_program("[-]]")
+
+
+def test_run_matches_step() -> None:
+    program = ">,[->++<]>."
+    stepped = StateMachine(program, [4])
+    while stepped._program_counter != len(program):
+        stepped.step()
+    fast = StateMachine(program, [4])
+    assert fast.run() == stepped._outputs == [8]
+    assert fast._tape._tape == stepped._tape._tape
+    assert fast._tape._cursor == stepped._tape._cursor
+
+
+def test_run_keeps_tape_assertions() -> None:
+    with pytest.raises(AssertionError):
+        StateMachine("+--", []).run()
+    with pytest.raises(AssertionError):
+        StateMachine("><<", []).run()
+
+
+def test_clear_idiom() -> None:
+    assert compile_program(">[-]<") == [(MOVE, 1), (CLEAR, 0), (MOVE, -1)]
+
+
+def test_scan_idiom() -> None:
+    assert compile_program("[<<]") == [(SCAN, -2)]
+    assert StateMachine("+>+>+>>+<<<<[>]>.", []).run() == [1]
+
+
+@pytest.mark.parametrize("program, expected", [("+[>>]>.", [0]), ("+[>>>]+.", [1])])
+def test_scan_grows_tape(program: str, expected: list[int]) -> None:
+    assert StateMachine(program, []).run() == expected
+    assert StateMachine(program, [], code=compile_program(program)).run() == expected
+
+
+def test_multiply_add_idiom() -> None:
+    assert compile_program("[->>+++<<<-->]") == [(MULADD, ((-1, -2), (2, 3)))]
+    assert StateMachine(">,>,[-<->>+++<]<.>>.", [5, 3]).run() == [2, 9]
+
+
+def test_balanced_moves_clear() -> None:
+    assert compile_program("[-><]") == [(CLEAR, 0)]
+    assert compile_program(">[->><<]") == [(MOVE, 1), (CLEAR, 0)]
+    assert compile_program("[-<>]")[0][0] == JZ
+
+
+@pytest.mark.parametrize("program", ["+[-><].", ">+[->><<]."])
+def test_balanced_moves_run(program: str) -> None:
+    assert StateMachine(program, []).run() == [0]
+    for tape in (ArrayTape(CellMode.UNBOUNDED), PagedTape(CellMode.WRAP8)):
+        assert StateMachine(program, [], tape=tape).run() == [0]
+
+
+def test_unsupported_loops_stay_loops() -> None:
+    assert compile_program("[->+<-]")[0][0] == JZ
+    assert compile_program("[->+-<]")[0][0] == JZ
+    assert compile_program("[->+<<]")[0][0] == JZ
+    assert compile_program("[-[-]]")[0][0] == JZ
+
+
+def test_idioms_keep_tape_assertions() -> None:
+    with pytest.raises(AssertionError):
+        StateMachine(",>+<[->-<]", [2]).run()
+    with pytest.raises(AssertionError):
+        StateMachine(",[-<+>]", [1]).run()
+    StateMachine("[-<+>]", []).run()
+
+
+def test_compile_in_chunks() -> None:
+    program = "++[>+++[>++<-]<-]>>.,[-]+[>]"
+    for size in (1, 2, 5):
+        compiler = Compiler()
+        for start in range(0, len(program), size):
+            compiler.feed(program[start : start + size])
+        code, positions = compiler.finish()
+        assert code == compile_program(program)
+        assert positions[-1] == program.index("[>]")
+
+    compiler = Compiler()
+    compiler.feed("+[")
+    with pytest.raises(ValueError):
+        compiler.finish()
+
+
+def test_to_source() -> None:
+    program = "++[>+++[>++<-]<-]>>.,[-]+[>]>>+++[-<+>>++<]"
+    code = compile_program(program)
+    source = to_source(code)
+    assert compile_program(source) == code
+    assert to_source(compile_program(program, idioms=False)) == program
+    assert StateMachine(source, [4]).run() == StateMachine(program, [4]).run()
+
+
+def test_address_offsets() -> None:
+    code = compile_program(">+>++<<,[->>+<.<]>>.", offsets=True)
+    assert code == [
+        (ADDAT, (1, 1)),
+        (ADDAT, (2, 2)),
+        (INAT, 0),
+        (JZ, 8),
+        (ADDAT, (0, -1)),
+        (ADDAT, (2, 1)),
+        (OUTAT, 1),
+        (JNZ, 4),
+        (OUTAT, 2),
+        (MOVE, 2),
+    ]
+    assert compile_program("[-]+++>>[-]-", offsets=True) == [
+        (SETAT, (0, 3)),
+        (SETAT, (2, 0)),
+        (ADDAT, (2, -1)),
+        (MOVE, 2),
+    ]
+
+
+SQUARES_LIKE = "++++[>+++++<-]>[<+++++>-]+<+[>[>+>+<<-]++>>[<<+>>-]<<<-]>>."
+
+
+@pytest.mark.parametrize(
+    "program, inputs",
+    [
+        (",[->+>++<<]>>.<.", [7]),
+        (SQUARES_LIKE, []),
+        (",>,<[->[->+>+<<]>>[-<<+>>]<<<]>>>.", [6, 7]),
+        ("+[>+<-]>[>]<.", []),
+        ("+[-><].", []),
+        (">+[->><<].", []),
+    ],
+)
+def test_offsets_keep_behavior(program: str, inputs: list[int]) -> None:
+    expected = StateMachine(program, inputs, code=compile_program(program)).run()
+    code = compile_program(program, offsets=True)
+    assert StateMachine(program, inputs, code=code).run() == expected
+    assert StateMachine(to_source(code), inputs).run() == expected
+
+
+def test_offsets_keep_tape_assertions() -> None:
+    for program in ["<+>", "-", ">><<<>>>+", "+>[-]<<", "<>+>+,+<+>>"]:
+        with pytest.raises(AssertionError):
+            StateMachine(program, [], code=compile_program(program, offsets=True)).run()
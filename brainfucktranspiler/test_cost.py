@@ -0,0 +1,68 @@
+import inspect
+
+import pytest
+
+from . import codegen
+from .compiler import compile_program
+from .cost import SHAPES, _Shape, _linear, _measure, fit_cost_model
+
+
+@pytest.mark.parametrize("name", sorted(SHAPES))
+@pytest.mark.parametrize("idioms", [True, False])
+def test_cost_matches_interpreter(name: str, idioms: bool) -> None:
+    helper = getattr(codegen, name)
+    model = fit_cost_model(helper, idioms)
+    tape = codegen.TapeStack()
+    operands = list(inspect.signature(helper).parameters)[1:]
+    variables = [tape.register_variable() for _ in operands]
+    size = model.size(tape, *variables)
+    code = helper(tape, *variables)
+    assert size == len(code)
+
+    compiled = compile_program(code) if idioms else None
+    positions = {name: var.position for name, var in zip(operands, variables)}
+    for value in (0, 1, 7, 23, 40):
+        values = {name: value + 3 * index for index, name in enumerate(model.inputs)}
+        if "divisor" in values:
+            values["divisor"] = value % 9 + 1
+        if not SHAPES[name].valid(values):
+            values = dict(zip(model.inputs, sorted(values.values(), reverse=True)))
+        steps = _measure(code, compiled, positions, values)
+        assert model.steps(**values) == steps
+
+
+def test_copy_formula() -> None:
+    model = fit_cost_model(codegen.fn_copy, idioms=False)
+    assert dict(model.terms) == {"1": 10, "source": 13}
+    assert str(model) == "fn_copy: 10 + 13*source steps"
+
+
+def test_size_of_placement() -> None:
+    model = fit_cost_model(codegen.fn_copy)
+    tape = codegen.TapeStack()
+    source = tape.register_variable()
+    destination = tape.register_variable()
+    sizes = [
+        model.size(tape, destination, source),
+        model.size(tape, source, destination),
+    ]
+    assert tape._position == 0
+    assert sizes == [len(codegen.fn_copy(tape, destination, source)), 27]
+
+
+def test_pick_implementation() -> None:
+    slow = fit_cost_model(codegen.fn_divide)
+    fast = fit_cost_model(codegen.fn_divide_fast)
+    assert fast.steps(dividend=200, divisor=3) < slow.steps(dividend=200, divisor=3)
+    assert fast.worst_case(dividend=255, divisor=255) == fast.steps(
+        dividend=255, divisor=1
+    )
+    assert slow.worst_case(dividend=20, divisor=20) > 500
+
+
+def test_missing_terms(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setitem(
+        SHAPES, "fn_multiply", _Shape(("left", "right"), _linear("left", "right"))
+    )
+    with pytest.raises(ValueError):
+        fit_cost_model(codegen.fn_multiply, idioms=False)
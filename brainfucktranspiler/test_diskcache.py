@@ -0,0 +1,72 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .compiler import compile_program
+from .diskcache import ProgramCache, _key
+from .interpreter import StateMachine
+from .jit import jit_compile
+from .tape import CellMode
+
+HELLO = "+++++++++[>++++++++<-]>.>++++++++++[<+++>-]<+++.>++++++++++."
+NESTED = "++++[>+++++<-]>[<+++++>-]+<+[>[>+>+<<-]++>>[<<+>>-]<<<-]>>."
+
+
+def test_round_trip(tmp_path) -> None:
+    cache = ProgramCache(str(tmp_path))
+    program = ",[->+>++<<]>>[-]+[>]" + NESTED
+    for idioms, offsets in [(True, False), (False, False), (True, True)]:
+        expected = compile_program(program, idioms, offsets)
+        assert cache.compile(program, idioms, offsets) == expected
+        assert cache.compile(program, idioms, offsets) == expected
+    assert (cache.hits, cache.misses) == (3, 3)
+
+    reopened = ProgramCache(str(tmp_path))
+    code = reopened.compile(program)
+    assert reopened.hits == 1
+    assert StateMachine(None, [3], code=code).run() == StateMachine(program, [3]).run()
+
+
+def test_jit_source(tmp_path) -> None:
+    cache = ProgramCache(str(tmp_path))
+    source = cache.jit_source(HELLO, CellMode.WRAP8)
+    assert ProgramCache(str(tmp_path)).jit_source(HELLO, CellMode.WRAP8) == source
+    runner = jit_compile(HELLO + "+-", CellMode.WRAP8, disk=cache)
+    assert bytes(runner([])) == b"Hi\n"
+    assert cache.jit_source(HELLO + "+-", CellMode.WRAP8) == runner.source
+
+
+def test_corrupt_entries_are_recompiled(tmp_path) -> None:
+    cache = ProgramCache(str(tmp_path))
+    cache.compile(HELLO)
+    (path,) = tmp_path.iterdir()
+    path.write_bytes(path.read_bytes()[:-8])
+    assert cache.compile(HELLO) == compile_program(HELLO)
+    assert cache.misses == 2
+    path.write_bytes(b"")
+    assert cache.compile(HELLO) == compile_program(HELLO)
+    assert cache.misses == 3
+
+
+def test_eviction(tmp_path) -> None:
+    cache = ProgramCache(str(tmp_path), max_bytes=1000)
+    programs = [f"{'+' * index}[->+<]." for index in range(1, 30)]
+    for index, program in enumerate(programs):
+        cache.compile(program)
+        os.utime(cache._path(_key(program, True, False, None)), (index, index))
+        assert cache.size() <= 1000
+    assert cache.compile(programs[-1]) and cache.hits == 1
+    assert cache.compile(programs[0]) and cache.hits == 1
+
+
+def test_concurrent_writers(tmp_path) -> None:
+    caches = [ProgramCache(str(tmp_path)) for _ in range(4)]
+    programs = [NESTED + "+" * index for index in range(20)]
+
+    def write(cache: ProgramCache) -> bool:
+        return all(cache.compile(p) == compile_program(p) for p in programs)
+
+    with ThreadPoolExecutor(len(caches)) as executor:
+        assert all(executor.map(write, caches))
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        _key(program, True, False, None).hex() + ".bfc" for program in programs
+    )
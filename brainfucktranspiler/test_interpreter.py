@@ -1,4 +1,8 @@
-from .interpreter import RightInfiniteTape, StateMachine
+import io
+
+import pytest
+
+from .interpreter import RightInfiniteTape, StateMachine, match_brackets
 
 
 def test_tape_increment() -> None:
@@ -48,3 +52,37 @@ def test_state_machine() -> None:
     sm = StateMachine(program=program, inputs=[2, 3])
     result = sm.run()
     assert result == [6]
+
+
+def test_match_brackets() -> None:
+    assert match_brackets("+[->[-]<]") == {1: 8, 8: 1, 4: 6, 6: 4}
+
+
+def test_unbalanced_brackets() -> None:
+    with pytest.raises(ValueError, match="']' at position 4"):
+        StateMachine("+[-]]", [])
+    with pytest.raises(ValueError, match="'\\[' at position 0"):
+        StateMachine("[[-]", [])
+
+
+def test_streaming_outputs() -> None:
+    def numbers():
+        yield 1
+        yield 2
+        raise AssertionError("Read too far")
+
+    outputs = StateMachine(",.,.,.", numbers()).outputs()
+    assert next(outputs) == 1
+    assert next(outputs) == 2
+
+
+def test_byte_stream_input_and_sink() -> None:
+    received = []
+    sm = StateMachine(",[.,]", io.BytesIO(b"abc\0"), sink=received.append)
+    assert sm.run() == []
+    assert received == [97, 98, 99]
+
+
+def test_missing_input() -> None:
+    with pytest.raises(IndexError):
+        StateMachine(",,", [1]).run()
@@ -0,0 +1,66 @@
+import pytest
+
+from .codegen import TapeStack, fn_divide, op_input, op_output
+from .interpreter import StateMachine
+from .jit import jit_compile
+
+
+def test_jit_divide() -> None:
+    tape = TapeStack()
+    quotient = tape.register_variable()
+    remainder = tape.register_variable()
+    dividend = tape.register_variable()
+    divisor = tape.register_variable()
+    code = (
+        op_input(tape, dividend)
+        + op_input(tape, divisor)
+        + fn_divide(tape, quotient, remainder, dividend, divisor)
+        + op_output(tape, quotient)
+        + op_output(tape, remainder)
+    )
+    run = jit_compile(code)
+    assert run([10, 3]) == [3, 1]
+    assert run([10, 5]) == [2, 0]
+
+
+def test_jit_is_cached() -> None:
+    assert jit_compile(",[->+<]>.") is jit_compile(",[->+<]>.")
+    assert jit_compile(",[->+<]>.")([4]) == [4]
+
+
+def test_jit_deep_nesting() -> None:
+    depth = 30
+    program = "+" + "[>+" * depth + "<" * depth + "-" + "]" * depth + ">" * depth + "."
+    assert jit_compile(program)([]) == [1]
+
+
+def test_jit_tape_assertions() -> None:
+    with pytest.raises(AssertionError):
+        jit_compile("+--")([])
+    with pytest.raises(AssertionError):
+        jit_compile("><<")([])
+    with pytest.raises(AssertionError):
+        jit_compile("<>+>+,+<+>>")([])
+    with pytest.raises(IndexError):
+        jit_compile(",,")([1])
+    with pytest.raises(IndexError):
+        jit_compile(",,<.")([])
+
+
+def test_jit_tape_growth() -> None:
+    assert jit_compile(">" * 200 + "+[>+<-]>.")([]) == [1]
+
+
+@pytest.mark.parametrize(
+    "program, inputs",
+    [
+        ("+[-><].", []),
+        (">+[->><<].", []),
+        (",[->+>++<<]>>.<.", [7]),
+        ("+[>+<-]>[>]<.", []),
+        ("[-<+>].", []),
+        ("[-<<+>>]+.", []),
+    ],
+)
+def test_jit_matches_interpreter(program: str, inputs: list[int]) -> None:
+    assert jit_compile(program)(inputs) == StateMachine(program, inputs).run()
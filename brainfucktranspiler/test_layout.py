@@ -0,0 +1,30 @@
+from .benchmark.workloads import euler_1
+from .codegen import TapeStack, op_decrement, op_input, op_output, op_while
+from .interpreter import StateMachine
+from .layout import optimize_layout
+
+
+def test_optimize_layout() -> None:
+    original = euler_1(TapeStack())
+    code, report = optimize_layout(euler_1)
+    assert report.cost_after < report.cost_before
+    assert sorted(report.positions.values()) == list(range(9))
+
+    before = StateMachine(original, [3, 5, 10])
+    after = StateMachine(code, [3, 5, 10])
+    assert before.run() == after.run() == [23]
+
+
+def test_layout_moves_hot_variable_first() -> None:
+    def program(tape: TapeStack) -> str:
+        far = tape.register_variable()
+        near = tape.register_variable()
+        return (
+            op_input(tape, near)
+            + op_while(tape, near, lambda: op_decrement(tape, near))
+            + op_output(tape, far)
+        )
+
+    code, report = optimize_layout(program)
+    assert report.positions == {0: 1, 1: 0}
+    assert code == ",[-]>."
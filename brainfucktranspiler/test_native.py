@@ -0,0 +1,104 @@
+import os
+
+import pytest
+
+from .codegen import TapeStack, fn_divide, op_input, op_output
+from .jit import jit_compile
+from .native import _cache, find_compiler, native_compile
+from .tape import CellMode
+
+needs_compiler = pytest.mark.skipif(find_compiler() is None, reason="No C compiler")
+# Falling back to the JIT would hide broken C, so it fails these tests.
+pytestmark = pytest.mark.filterwarnings("error::RuntimeWarning")
+
+
+@needs_compiler
+def test_native_divide(tmp_path) -> None:
+    tape = TapeStack()
+    quotient = tape.register_variable()
+    remainder = tape.register_variable()
+    dividend = tape.register_variable()
+    divisor = tape.register_variable()
+    code = (
+        op_input(tape, dividend)
+        + op_input(tape, divisor)
+        + fn_divide(tape, quotient, remainder, dividend, divisor)
+        + op_output(tape, quotient)
+        + op_output(tape, remainder)
+    )
+    run = native_compile(code, directory=str(tmp_path))
+    assert run.source.startswith("#include")
+    assert run is not jit_compile(code)
+    assert run([10, 3]) == [3, 1]
+    assert run([10, 5]) == [2, 0]
+
+
+@needs_compiler
+def test_native_tape_assertions(tmp_path) -> None:
+    directory = str(tmp_path)
+    with pytest.raises(AssertionError):
+        native_compile("+--", directory=directory)([])
+    with pytest.raises(AssertionError):
+        native_compile("><<", directory=directory)([])
+    with pytest.raises(AssertionError):
+        native_compile("<>+>+,+<+>>", directory=directory)([])
+    with pytest.raises(IndexError):
+        native_compile(",,", directory=directory)([1])
+    with pytest.raises(IndexError):
+        native_compile(",,<.", directory=directory)([])
+
+
+@needs_compiler
+def test_native_skipped_multiply_add(tmp_path) -> None:
+    directory = str(tmp_path)
+    assert native_compile("[-<+>].", directory=directory)([]) == [0]
+    assert native_compile("[-<<+>>]+.", directory=directory)([]) == [1]
+
+
+@needs_compiler
+def test_native_wrapping(tmp_path) -> None:
+    directory = str(tmp_path)
+    assert native_compile("-.+.", CellMode.WRAP8, directory)([]) == [255, 0]
+    assert native_compile(",.", CellMode.WRAP16, directory)([-1]) == [65535]
+
+
+@needs_compiler
+def test_native_many_outputs_and_tape_growth(tmp_path) -> None:
+    directory = str(tmp_path)
+    outputs = native_compile("+[.+]", CellMode.WRAP16, directory)([])
+    assert outputs == list(range(1, 1 << 16))
+    assert native_compile(">" * 200 + "+[>+<-]>.", directory=directory)([]) == [1]
+
+
+def test_native_falls_back_without_compiler(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("CC", "no-such-compiler")
+    with pytest.warns(RuntimeWarning, match="No C compiler"):
+        run = native_compile(",+.", directory=str(tmp_path / "fallback"))
+    assert run is jit_compile(",+.")
+    assert run([1]) == [2]
+
+
+def test_native_warns_when_compiling_fails(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("CC", "false")
+    with pytest.warns(RuntimeWarning, match="Compiling C failed"):
+        run = native_compile(",++.", directory=str(tmp_path))
+    assert run is jit_compile(",++.")
+
+
+@needs_compiler
+def test_native_refuses_foreign_writable_files(tmp_path) -> None:
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.warns(RuntimeWarning, match="not writable"):
+        run = native_compile(",+++.", directory=str(shared))
+    assert run is jit_compile(",+++.")
+
+    private = tmp_path / "private"
+    run = native_compile(",++++.", directory=str(private))
+    assert os.stat(private).st_mode & 0o777 == 0o700
+    (library,) = private.glob("*.so")
+    library.chmod(0o777)
+    _cache.clear()
+    with pytest.warns(RuntimeWarning, match="not writable"):
+        native_compile(",++++.", directory=str(private))
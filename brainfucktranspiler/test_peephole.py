@@ -0,0 +1,59 @@
+from .codegen import TapeStack, fn_plus, op_input, op_output
+from .interpreter import StateMachine
+from .peephole import optimize, report
+
+
+def test_cancel_inverse() -> None:
+    assert optimize(",>><<+-.", zero_tape=False) == ",."
+    assert optimize(",>+<-<>>-<", zero_tape=False) == ",>+<->-<"
+    assert optimize("<>+.") == "+."
+
+
+def test_known_zero_loops() -> None:
+    assert optimize("[-]>[->+<]+.") == ">+."
+    assert optimize(",[-]>[-]<[-]", zero_tape=False) == ",[-]>[-]<"
+    assert optimize(",[->+<]>[->+<]<[-]", zero_tape=False) == ",[->+<]>[->+<]<"
+
+
+def test_loop_effects_are_respected() -> None:
+    assert optimize(",[->+<]>[-]") == ",[->+<]>[-]"
+    assert optimize(",[>]<[-]") == ",[>]<[-]"
+    assert optimize(",[[-]>[-]<]") == ",[[-]>[-]<]"
+
+
+def test_report() -> None:
+    tape = TapeStack()
+    result = tape.register_variable()
+    left = tape.register_variable()
+    right = tape.register_variable()
+    code = (
+        op_input(tape, left)
+        + op_input(tape, right)
+        + fn_plus(tape, result, left, right)
+        + op_output(tape, result)
+    )
+    savings = report(code, [[1, 2], [3, 4]])
+    assert savings.characters_saved > 0
+    assert savings.steps_saved > 0
+    assert StateMachine(optimize(code), [3, 4]).run() == [7]
+
+    savings = report(",>+<-+.", [[2], [5]])
+    assert (savings.steps_before, savings.steps_after) == (14, 10)
+
+
+def test_codegen_flag() -> None:
+    def program(tape: TapeStack) -> str:
+        result = tape.register_variable()
+        left = tape.register_variable()
+        right = tape.register_variable()
+        return (
+            op_input(tape, left)
+            + op_input(tape, right)
+            + fn_plus(tape, result, left, right)
+            + op_output(tape, result)
+        )
+
+    plain = program(TapeStack())
+    optimized = program(TapeStack(optimize=True))
+    assert len(optimized) < len(plain)
+    assert StateMachine(optimized, [5, 6]).run() == [11]
@@ -0,0 +1,48 @@
+import time
+
+import pytest
+
+from .interpreter import BudgetExceeded, StateMachine
+from .pool import BUDGET_EXCEEDED, OK, RUNTIME_ERROR, run_many
+
+
+def test_step_budget() -> None:
+    machine = StateMachine("+[]", [], max_steps=100)
+    with pytest.raises(BudgetExceeded):
+        machine.run()
+    assert machine.steps == 101
+
+
+def test_timeout() -> None:
+    with pytest.raises(BudgetExceeded, match="timeout"):
+        StateMachine("+[]", [], timeout=0.01).run()
+
+
+def test_run_many() -> None:
+    program = ",[->++<]>."
+    results = list(run_many(program, [[1], [2], [3]], workers=2))
+    assert sorted((r.index, r.status, r.outputs) for r in results) == [
+        (0, OK, [2]),
+        (1, OK, [4]),
+        (2, OK, [6]),
+    ]
+
+
+def test_run_many_failures() -> None:
+    program = ",[-[+]]-"
+    results = {
+        r.index: r
+        for r in run_many(program, [[0], [2], [1], []], workers=2, max_steps=1000)
+    }
+    assert results[0].status == RUNTIME_ERROR
+    assert results[1].status == BUDGET_EXCEEDED
+    assert results[2].status == RUNTIME_ERROR
+    assert results[3].status == RUNTIME_ERROR
+
+
+def test_run_many_cancels_when_closed() -> None:
+    start = time.perf_counter()
+    results = run_many("+[]", [[]] * 20, workers=1, timeout=0.2)
+    assert next(results).status == BUDGET_EXCEEDED
+    results.close()
+    assert time.perf_counter() - start < 2
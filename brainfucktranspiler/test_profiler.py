@@ -0,0 +1,37 @@
+from .compiler import compile_program
+from .interpreter import StateMachine
+from .profiler import profile
+
+
+def test_profile_counts() -> None:
+    program = ",[>+++[-]<-]>>>."
+    outputs, result = profile(program, [4])
+    assert outputs == StateMachine(program, [4]).run()
+    assert result.growths >= 1
+
+    loops = {loop.position: loop for loop in result.hot_loops()}
+    assert loops[1].entries == 1
+    assert loops[1].iterations == 4
+    assert loops[6].entries == 4
+    assert loops[6].iterations == 12
+    assert loops[6].source == "[-]"
+    assert result.hot_loops()[0].position == 1
+    assert result.max_extent == 4
+    assert result.position_counts()[0] == 1
+
+
+def test_profile_steps_match_interpreter() -> None:
+    program = ",[->+>++<<]>[-<+>]>."
+    machine = StateMachine(program, [5], code=compile_program(program))
+    expected = machine.run()
+    outputs, result = profile(program, [5])
+    assert outputs == expected
+    assert result.steps == machine.steps
+
+
+def test_folded_stacks() -> None:
+    _, result = profile("+++[>++[>+<-]<-]", [])
+    lines = dict(line.rsplit(" ", 1) for line in result.folded_stacks().splitlines())
+    assert set(lines) == {"program", "program;loop@3", "program;loop@3;loop@7"}
+    assert int(lines["program;loop@3;loop@7"]) == 3
+    assert "steps" in result.report()
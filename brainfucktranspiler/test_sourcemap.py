@@ -0,0 +1,64 @@
+import pytest
+
+from .codegen import TapeStack, fn_divide, op_input, op_output
+from .interpreter import StateMachine
+from .profiler import profile
+
+
+def divide_program(tape: TapeStack) -> str:
+    quotient = tape.register_variable()
+    remainder = tape.register_variable()
+    dividend = tape.register_variable()
+    divisor = tape.register_variable()
+    return (
+        op_input(tape, dividend)
+        + op_input(tape, divisor)
+        + fn_divide(tape, quotient, remainder, dividend, divisor)
+        + op_output(tape, quotient)
+    )
+
+
+def test_source_map_ranges() -> None:
+    tape = TapeStack(source_map=True)
+    code = divide_program(tape)
+    assert code == divide_program(TapeStack())
+    assert StateMachine(code, [10, 3]).run() == [3]
+
+    source_map = tape.source_map()
+    first = source_map.innermost(code.index(","))
+    assert first.helper == "op_input"
+    assert first.path == ("op_input",)
+    assert first.operands == (2,)
+    assert source_map.innermost(len(code) - 1).helper == "op_output"
+    assert source_map.innermost(len(code)) is None
+
+    divide = next(e for e in source_map.entries if e.helper == "fn_divide")
+    assert divide.operands == (0, 1, 2, 3)
+    for entry in source_map.entries:
+        assert code[entry.start : entry.end].count("[") == code[
+            entry.start : entry.end
+        ].count("]")
+        if entry.start >= divide.start and entry.end <= divide.end:
+            assert entry.path[0] == "fn_divide"
+
+
+def test_steps_per_helper() -> None:
+    tape = TapeStack(source_map=True)
+    code = divide_program(tape)
+    source_map = tape.source_map()
+    _, result = profile(code, [100, 7])
+
+    per_operation = source_map.steps_per_operation(result)
+    assert sum(per_operation.values()) == result.steps
+    assert all(path.startswith("fn_divide") for path in list(per_operation)[:3])
+
+    per_helper = source_map.steps_per_helper(result)
+    assert per_helper["fn_divide"] > 0.9 * result.steps
+    assert 2 <= per_helper["op_input"] < 10
+
+
+def test_source_map_requires_plain_code() -> None:
+    with pytest.raises(ValueError):
+        TapeStack(optimize=True, source_map=True)
+    with pytest.raises(AssertionError):
+        TapeStack().source_map()
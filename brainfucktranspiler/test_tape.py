@@ -0,0 +1,97 @@
+import pytest
+
+from .interpreter import StateMachine
+from .jit import jit_compile
+from .profiler import profile
+from .tape import ArrayTape, CellMode, PagedTape
+
+
+def test_array_tape_growth() -> None:
+    tape = ArrayTape(size=2)
+    tape.right()
+    tape.right()
+    assert len(tape._tape) == 4
+    tape.increment()
+    tape.left()
+    assert str(tape) == "0 [0] 1"
+
+
+@pytest.mark.parametrize("tape", [ArrayTape(), PagedTape()])
+def test_unbounded_cells_hold_large_values(tape) -> None:
+    machine = StateMachine(",[->++<]>.", [2**70], tape=tape)
+    assert machine.run() == [2**71]
+
+
+def test_array_tape_unbounded_is_strict() -> None:
+    tape = ArrayTape(CellMode.UNBOUNDED)
+    with pytest.raises(AssertionError):
+        tape.decrement()
+    with pytest.raises(AssertionError):
+        tape.left()
+
+
+@pytest.mark.parametrize(
+    "mode, expected",
+    [(CellMode.WRAP8, 255), (CellMode.WRAP16, 65535), (CellMode.WRAP32, 2**32 - 1)],
+)
+def test_array_tape_wraps(mode: CellMode, expected: int) -> None:
+    tape = ArrayTape(mode)
+    tape.decrement()
+    assert tape.get() == expected
+    tape.increment()
+    assert tape.is_zero()
+
+
+def test_wrapping_program() -> None:
+    program = "-[->+<]>>,<[->-<]>."
+    for mode in (CellMode.WRAP8, CellMode.WRAP16):
+        expected = [(3 - (mode.modulus - 1)) % mode.modulus]
+        assert StateMachine(program, [3], tape=ArrayTape(mode)).run() == expected
+        assert jit_compile(program, mode)([3]) == expected
+
+        stepped = StateMachine(program, [3], tape=ArrayTape(mode))
+        while stepped._program_counter != len(program):
+            stepped.step()
+        assert stepped._outputs == expected
+
+
+def test_unbounded_array_program() -> None:
+    program = ",[->+++<]>."
+    assert StateMachine(program, [100], tape=ArrayTape(size=1)).run() == [300]
+
+
+def test_paged_tape() -> None:
+    tape = PagedTape(page_size=16, window=2)
+    tape.right()
+    tape.increment()
+    for _ in range(100):
+        tape.right()
+    assert tape.is_zero()
+    assert tape.pages() == 1
+    tape.increment()
+    assert tape.pages() == 2
+    assert str(tape) == "... 0 0 [1] 0 0 ..."
+    tape._park(1)
+    assert str(tape) == "0 [1] 0 0 ..."
+    with pytest.raises(AssertionError):
+        PagedTape().decrement()
+    with pytest.raises(AssertionError):
+        PagedTape().left()
+
+
+@pytest.mark.parametrize("mode", [CellMode.UNBOUNDED, CellMode.WRAP8])
+def test_paged_tape_program(mode: CellMode) -> None:
+    far = ">" * 50_000
+    program = "-[->+<]>>,<[->-<]>." if mode.modulus else ",[->+<]>."
+    program += "+++[-" + far + "+" + "<" * 50_000 + "]" + far + "."
+    expected = StateMachine(program, [7], tape=ArrayTape(mode)).run()
+
+    tape = PagedTape(mode, page_size=256)
+    assert StateMachine(program, [7], tape=tape).run() == expected
+    assert tape.pages() == 2
+
+    stepped = StateMachine(program, [7], tape=PagedTape(mode))
+    while stepped._program_counter != len(program):
+        stepped.step()
+    assert stepped._outputs == expected
+    assert profile(program, [7], PagedTape(mode))[0] == expected